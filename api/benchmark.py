@@ -0,0 +1,305 @@
+"""
+Repeatable in-process benchmark of every route in ``api.urls`` and of ``update_task_missed``.
+
+Runs against the configured database (PostgreSQL or SQLite) filled by
+``generate_org``. Every route has a ``Scenario``: the method, the role it is
+called as and how to build its URL and body from the ``Fixture``. Writes are
+rolled back after each request and the whole run after the last one, so runs
+can be repeated on the same data and their JSON results compared.
+"""
+import re
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.profiling import percentile
+from task.locks import break_lock
+from task.models import ReportJob, Task, TaskReview
+from task.tasks import MISSED_SWEEP_LOCK, update_task_missed
+from user.authentication import set_role_claims
+from user.models import CustomUser, Sector
+from user.tokens import RefreshToken
+
+ROUTE_ARGUMENT = re.compile(r'<(?:\w+:)?(\w+)>')
+# Statements of the rollback around each write, not of the view.
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+BULK_SIZE = 50
+
+
+class MissingData(Exception):
+    pass
+
+
+class Fixture:
+    """Users and objects the scenarios refer to, picked from the generated organisation."""
+
+    def __init__(self, password):
+        self.password = password
+        self.director = self.first(CustomUser.objects.filter(status='director', is_active=True))
+        self.admin = self.first(CustomUser.objects.filter(is_staff=True, is_active=True))
+        # A manager's doing task, so its boss, employee and sector cover the per-role routes.
+        self.task = self.first(Task.objects.filter(boss_status='manager', status='doing', is_active=True)
+                               .select_related('boss', 'employee'))
+        self.manager = self.task.boss
+        self.employee = self.task.employee
+        self.sector_id = self.employee.sector_id
+        self.review = self.first(TaskReview.objects.filter(task__boss=self.manager, user=self.manager))
+        self.colleagues = list(CustomUser.objects.filter(sector_id=self.sector_id, status='employee')
+                               .values_list('pk', flat=True)[:BULK_SIZE])
+        self.manager_tasks = list(Task.objects.filter(boss=self.manager, status='doing', is_active=True)
+                                  .values_list('pk', flat=True)[:BULK_SIZE])
+        today = timezone.localdate()
+        self.report = ReportJob.objects.create(kind='sector', start_date=today - timedelta(days=30),
+                                               end_date=today, key='benchmark', requested_by=self.director)
+        self.users = {'director': self.director, 'manager': self.manager, 'employee': self.employee,
+                      'admin': self.admin}
+
+    @staticmethod
+    def first(queryset):
+        obj = queryset.order_by('pk').first()
+        if obj is None:
+            raise MissingData(f'No {queryset.model.__name__} to benchmark with, run generate_org first.')
+        return obj
+
+    def access_token(self, role):
+        user = self.users[role]
+        return str(set_role_claims(AccessToken.for_user(user), user))
+
+    def refresh_token(self, role='employee'):
+        user = self.users[role]
+        return str(set_role_claims(RefreshToken.for_user(user), user))
+
+    def deadline(self):
+        return (timezone.now() + timedelta(days=7)).isoformat()
+
+
+@dataclass
+class Scenario:
+    route: str
+    method: str = 'get'
+    # Who sends the request; None is anonymous.
+    role: str = 'director'
+    kwargs: callable = lambda fixture: {}
+    data: callable = None
+    writes: bool = False
+    query: dict = field(default_factory=dict)
+
+    @property
+    def key(self):
+        return f'{self.method.upper()} {self.route}'
+
+    def url(self, fixture):
+        kwargs = self.kwargs(fixture)
+        return '/api/' + ROUTE_ARGUMENT.sub(lambda match: str(kwargs[match.group(1)]), self.route)
+
+
+SCENARIOS = [
+    # AUTHENTICATION
+    Scenario('signup/', role=None),
+    Scenario('login/', 'post', None, data=lambda f: {'username': f.employee.username, 'password': f.password},
+             writes=True),
+    Scenario('logout/', 'post', 'employee', data=lambda f: {'refresh': f.refresh_token()}, writes=True),
+    Scenario('refresh/', 'post', None, data=lambda f: {'refresh': f.refresh_token()}, writes=True),
+    Scenario('black/', 'post', None, data=lambda f: {'refresh': f.refresh_token()}, writes=True),
+    # USER PROFILE, SECTORS
+    Scenario('profiles/'),
+    Scenario('sectors/'),
+    Scenario('sector/<str:pk>/', kwargs=lambda f: {'pk': f.sector_id}),
+    # TASKS
+    Scenario('tasks/create/', 'post', 'manager', writes=True,
+             data=lambda f: {'problem': 'Benchmark', 'deadline': f.deadline(), 'employee': f.employee.pk}),
+    Scenario('task/<str:pk>/', role='manager', kwargs=lambda f: {'pk': f.task.pk}),
+    Scenario('manager/tasks/', role='manager'),
+    Scenario('director/tasks/'),
+    Scenario('tasks/changes/', role='manager'),
+    # REVIEWS
+    Scenario('reviews/', role='manager'),
+    Scenario('review/<str:pk>/', role='manager', kwargs=lambda f: {'pk': f.review.pk}),
+    Scenario('reviews/tasks/<int:id>/', role='manager', kwargs=lambda f: {'id': f.task.pk}),
+    Scenario('task/reviews/<int:id>/', role='manager', kwargs=lambda f: {'id': f.task.pk}),
+    # FINISH, CANCEL, BULK
+    Scenario('finish/<int:id>/', 'patch', 'employee', kwargs=lambda f: {'id': f.task.pk}, writes=True),
+    Scenario('cancel/<int:id>/', 'patch', 'manager', kwargs=lambda f: {'id': f.task.pk}, writes=True),
+    Scenario('tasks/bulk/create/', 'post', 'manager', writes=True,
+             data=lambda f: {'problem': 'Benchmark', 'deadline': f.deadline(), 'employees': f.colleagues}),
+    Scenario('tasks/bulk/finish/', 'post', 'manager', data=lambda f: {'ids': f.manager_tasks}, writes=True),
+    Scenario('tasks/bulk/cancel/', 'post', 'manager', data=lambda f: {'ids': f.manager_tasks}, writes=True),
+    # STATS
+    Scenario('sectors/stats/'),
+    Scenario('tasks/stats/'),
+    Scenario('managers/stats/'),
+    Scenario('users/stats/'),
+    Scenario('stats/sector/<int:id>/', kwargs=lambda f: {'id': f.sector_id}),
+    Scenario('tasks/sector/<int:id>/', kwargs=lambda f: {'id': f.sector_id}),
+    Scenario('employee/sector/<int:id>/', kwargs=lambda f: {'id': f.sector_id}),
+    # EXPORTS, REPORTS
+    Scenario('tasks/export/', query={'type': 'csv'}),
+    Scenario('employees/stats/export/', query={'type': 'csv'}),
+    Scenario('reports/', 'post', writes=True,
+             data=lambda f: {'kind': 'employee', 'start_date': str(f.report.start_date),
+                             'end_date': str(f.report.end_date)}),
+    Scenario('report/<int:pk>/', kwargs=lambda f: {'pk': f.report.pk}),
+    # PROFILING
+    Scenario('profiling/', role='admin'),
+    Scenario('metrics/', role='admin'),
+    # PERSONAL PAGES
+    Scenario('user/sector/tasks/<int:id>/', kwargs=lambda f: {'id': f.employee.pk}),
+    Scenario('user/director/tasks/<int:id>/', kwargs=lambda f: {'id': f.employee.pk}),
+    Scenario('profile/<str:pk>/', kwargs=lambda f: {'pk': f.employee.pk}),
+    Scenario('employees/stats/<int:id>/', kwargs=lambda f: {'id': f.employee.pk}),
+    Scenario('user/profile/', role='employee'),
+    Scenario('user/stat/', role='employee'),
+    Scenario('user/sector/tasks/', role='employee'),
+    Scenario('user/director/tasks/', role='employee'),
+]
+
+
+def api_routes():
+    from api.urls import urlpatterns
+
+    return [str(pattern.pattern) for pattern in urlpatterns]
+
+
+# Routes a request/response measurement says nothing about.
+UNMEASURED_ROUTES = {
+    # A stream held open for TASK_EVENTS_MAX_AGE seconds, and only under ASGI.
+    'tasks/events/',
+}
+
+
+def uncovered_routes(scenarios=SCENARIOS):
+    covered = {scenario.route for scenario in scenarios} | UNMEASURED_ROUTES
+    return [route for route in api_routes() if route not in covered]
+
+
+def summary(durations, queries, elapsed):
+    durations = sorted(durations)
+    return {
+        'iterations': len(durations),
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 95) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+        'mean_ms': round(statistics.mean(durations) * 1000, 3),
+        'throughput_rps': round(len(durations) / elapsed, 1) if elapsed else None,
+        'queries': max(queries),
+        'queries_min': min(queries),
+    }
+
+
+def count_queries(captured):
+    return sum(1 for query in captured if not query['sql'].startswith(SAVEPOINT_STATEMENTS))
+
+
+def call(client, scenario, fixture):
+    method = getattr(client, scenario.method)
+    data = scenario.data(fixture) if scenario.data else scenario.query or None
+    response = method(scenario.url(fixture), data, format='json' if scenario.data else None)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def client_for(fixture, role):
+    """An API client sending ``role``'s access token, anonymous for ``None``."""
+    client = APIClient()
+    if role:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {fixture.access_token(role)}')
+    return client
+
+
+def measure(client, scenario, fixture):
+    """Send one request of ``scenario``; returns the response, its query count and duration."""
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        if scenario.writes:
+            with transaction.atomic():
+                response = call(client, scenario, fixture)
+                transaction.set_rollback(True)
+        else:
+            response = call(client, scenario, fixture)
+        duration = time.perf_counter() - start
+    return response, count_queries(captured), duration
+
+
+def run_scenario(scenario, fixture, iterations, warmup=1, cold=False):
+    client = client_for(fixture, scenario.role)
+    durations, queries, statuses = [], [], set()
+    elapsed = 0
+    for i in range(warmup + iterations):
+        if cold:
+            cache.clear()
+        response, count, duration = measure(client, scenario, fixture)
+        if i < warmup:
+            continue
+        elapsed += duration
+        durations.append(duration)
+        queries.append(count)
+        statuses.add(response.status_code)
+    return {**summary(durations, queries, elapsed), 'statuses': sorted(statuses)}
+
+
+def run_missed_sweep(iterations, warmup=1):
+    durations, queries, changed = [], [], 0
+    elapsed = 0
+    for i in range(warmup + iterations):
+        break_lock(MISSED_SWEEP_LOCK)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            with transaction.atomic():
+                changed = update_task_missed()
+                transaction.set_rollback(True)
+            duration = time.perf_counter() - start
+        if i < warmup:
+            continue
+        elapsed += duration
+        durations.append(duration)
+        queries.append(count_queries(captured))
+    return {**summary(durations, queries, elapsed), 'changed': changed}
+
+
+def run(password, iterations, warmup=1, cold=False, only=None, progress=None):
+    """Benchmark the scenarios whose route contains ``only`` (all by default); nothing is kept."""
+    results = {'routes': {}, 'jobs': {}}
+    with transaction.atomic():
+        fixture = Fixture(password)
+        for scenario in SCENARIOS:
+            if only and only not in scenario.route:
+                continue
+            results['routes'][scenario.key] = run_scenario(scenario, fixture, iterations, warmup, cold)
+            if progress:
+                progress(scenario.key, results['routes'][scenario.key])
+        if not only or only in 'update_task_missed':
+            results['jobs']['update_task_missed'] = run_missed_sweep(iterations, warmup)
+            if progress:
+                progress('update_task_missed', results['jobs']['update_task_missed'])
+        results['data'] = {
+            'sectors': Sector.objects.count(),
+            'users': CustomUser.objects.count(),
+            'tasks': Task.objects.count(),
+            'reviews': TaskReview.objects.count(),
+        }
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(baseline, current, tolerance):
+    """Regressions of ``current`` against ``baseline``: slower p95 beyond ``tolerance`` percent or more queries."""
+    regressions = []
+    for section in ('routes', 'jobs'):
+        for key, result in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(key)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f'{key}: {before["queries"]} -> {result["queries"]} queries')
+            if result['p95_ms'] > before['p95_ms'] * (1 + tolerance / 100):
+                regressions.append(f'{key}: p95 {before["p95_ms"]} -> {result["p95_ms"]} ms')
+    return regressions
@@ -0,0 +1,237 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+QUANTILES = (50, 95, 99)
+# Signatures reported per endpoint; the ones seen in the most requests are kept.
+MAX_SIGNATURES = 10
+
+
+def percentile(values, q):
+    """``q``-th percentile (0-100) of a sorted list, nearest rank."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+class QueryRecorder:
+    """``execute_wrapper`` collecting the number, time and SQL of a request's queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            # Parameters are not part of ``sql``, so a query repeated per row has one signature.
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        threshold = settings.PROFILING_DUPLICATE_THRESHOLD
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+# The recorder of the request being profiled, seen by ``record_query`` in whatever thread runs its queries.
+_recorder = ContextVar('profiling_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install():
+    """
+    Put ``record_query`` on this thread's connections.
+
+    Connections are per thread: under ASGI the ORM runs in ``sync_to_async``
+    threads, so it is installed there, not in the event loop's thread.
+    """
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def recording(recorder):
+    token = _recorder.set(recorder)
+    try:
+        yield
+    finally:
+        _recorder.reset(token)
+
+
+class EndpointStats:
+    def __init__(self, view, route):
+        self.view = view
+        self.route = route
+        self.requests = 0
+        self.latencies = deque(maxlen=settings.PROFILING_WINDOW)
+        self.duration = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0
+        self.signatures = Counter()
+
+    def add(self, duration, recorder):
+        self.requests += 1
+        self.latencies.append(duration)
+        self.duration += duration
+        self.queries += recorder.count
+        self.query_time += recorder.time
+        self.max_queries = max(self.max_queries, recorder.count)
+        duplicates = recorder.duplicates()
+        if duplicates:
+            self.n_plus_one += 1
+            self.signatures.update(duplicates.keys())
+            for sql, _ in self.signatures.most_common()[MAX_SIGNATURES:]:
+                del self.signatures[sql]
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        return {
+            'view': self.view,
+            'route': self.route,
+            'requests': self.requests,
+            **{f'p{q}_ms': round(percentile(latencies, q) * 1000, 2) for q in QUANTILES},
+            'queries_per_request': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'query_ms_per_request': round(self.query_time * 1000 / self.requests, 2),
+            'n_plus_one_requests': self.n_plus_one,
+            'duplicate_queries': [{'sql': sql, 'requests': count} for sql, count in self.signatures.most_common()],
+        }
+
+
+class Registry:
+    """
+    Sampled request statistics of this process, per resolved URL.
+
+    Every worker process keeps its own; percentiles are over the last
+    ``PROFILING_WINDOW`` samples of an endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.started = time.time()
+
+    def add(self, view, route, duration, recorder):
+        with self.lock:
+            stats = self.endpoints.get((view, route))
+            if stats is None:
+                stats = self.endpoints[(view, route)] = EndpointStats(view, route)
+            stats.add(duration, recorder)
+
+    def report(self):
+        with self.lock:
+            endpoints = [stats.report() for stats in self.endpoints.values()]
+        return sorted(endpoints, key=lambda endpoint: endpoint['p95_ms'], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.started = time.time()
+
+
+registry = Registry()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """The registry in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        '# HELP api_request_duration_seconds Latency of sampled requests.',
+        '# TYPE api_request_duration_seconds summary',
+    ]
+    counters = {
+        'api_db_queries_total': ('Database queries of sampled requests.', []),
+        'api_db_query_seconds_total': ('Time spent in database queries of sampled requests.', []),
+        'api_n_plus_one_requests_total': ('Sampled requests repeating a query signature.', []),
+    }
+    with registry.lock:
+        endpoints = list(registry.endpoints.values())
+        for stats in endpoints:
+            labels = f'view="{_label(stats.view)}",route="{_label(stats.route)}"'
+            latencies = sorted(stats.latencies)
+            for q in QUANTILES:
+                lines.append(f'api_request_duration_seconds{{{labels},quantile="{q / 100}"}} {percentile(latencies, q)}')
+            lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats.duration}')
+            lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats.requests}')
+            counters['api_db_queries_total'][1].append(f'{{{labels}}} {stats.queries}')
+            counters['api_db_query_seconds_total'][1].append(f'{{{labels}}} {stats.query_time}')
+            counters['api_n_plus_one_requests_total'][1].append(f'{{{labels}}} {stats.n_plus_one}')
+    for name, (help_text, samples) in counters.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(name + sample for sample in samples)
+    return '\n'.join(lines) + '\n'
+
+
+class ProfilingMiddleware:
+    """
+    Record latency and database queries of a sample of requests, per resolved URL.
+
+    Enabled by ``PROFILING_SAMPLE_RATE`` (0 to 1); at 0 Django drops the
+    middleware altogether. Works in front of both sync and async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        install()
+        start = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+        self.record(request, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        # The thread the request's sync_to_async calls share.
+        await sync_to_async(install)()
+        start = time.perf_counter()
+        with recording(recorder):
+            response = await self.get_response(request)
+        self.record(request, time.perf_counter() - start, recorder)
+        return response
+
+    def record(self, request, duration, recorder):
+        match = request.resolver_match
+        if match is None:
+            registry.add('<unresolved>', '', duration, recorder)
+        else:
+            registry.add(match.view_name, match.route, duration, recorder)
@@ -1,3 +1,181 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from task.models import Task, TaskReview
+from user.authentication import set_role_claims, user_fields
+from user.models import CustomUser, Sector
+from .benchmark import SCENARIOS, Fixture, client_for, measure, uncovered_routes
+from .profiling import QueryRecorder, registry
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0)
+class ProfilingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', status='director', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_report(self):
+        self.client.get(reverse('director_tasks'))
+        self.client.get(reverse('tasks_stats'))
+        endpoints = {endpoint['view']: endpoint for endpoint in self.client.get(reverse('profiling')).data['endpoints']}
+        self.assertEqual(endpoints['director_tasks']['requests'], 1)
+        self.assertEqual(endpoints['director_tasks']['queries_per_request'], 2)
+        # Async views are measured too.
+        self.assertEqual(endpoints['tasks_stats']['queries_per_request'], 1)
+
+    async def test_asgi(self):
+        # Under ASGI the queries run in sync_to_async threads, on other connections than the event loop's.
+        token = set_role_claims(AccessToken.for_user(self.admin), self.admin)
+        headers = {'Authorization': f'Bearer {token}'}
+        await AsyncClient().get(reverse('director_tasks'), headers=headers)
+        await AsyncClient().get(reverse('tasks_stats'), headers=headers)
+        endpoints = {endpoint['view']: endpoint for endpoint in registry.report()}
+        # The first request also reads the user row for the active check.
+        self.assertEqual(endpoints['director_tasks']['queries_per_request'], 3)
+        self.assertEqual(endpoints['tasks_stats']['queries_per_request'], 1)
+
+    def test_prometheus(self):
+        self.client.get(reverse('director_tasks'))
+        response = self.client.get(reverse('metrics'))
+        self.assertIn(
+            'api_db_queries_total{view="director_tasks",route="api/director/tasks/"} 2',
+            response.content.decode(),
+        )
+
+    def test_admin_only(self):
+        self.client.force_authenticate(CustomUser.objects.create(username='employee'))
+        self.assertEqual(self.client.get(reverse('profiling')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_duplicate_queries(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in range(5):
+                CustomUser.objects.filter(pk=pk).exists()
+            CustomUser.objects.count()
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(list(recorder.duplicates().values()), [5])
+
+
+# Most queries a request of each scenario in ``api.benchmark`` may make, whatever
+# the role, and how many more it may make per row added to the data (0: O(1)).
+QUERY_BUDGETS = {
+    'GET signup/': (1, 0),
+    'POST login/': (4, 0),
+    'POST logout/': (8, 0),
+    'POST refresh/': (9, 0),
+    'POST black/': (8, 0),
+    'GET profiles/': (3, 0),
+    'GET sectors/': (1, 0),
+    'GET sector/<str:pk>/': (1, 0),
+    'POST tasks/create/': (9, 0),
+    'GET task/<str:pk>/': (1, 0),
+    'GET manager/tasks/': (2, 0),
+    'GET director/tasks/': (2, 0),
+    'GET tasks/changes/': (3, 0),
+    'GET reviews/': (1, 0),
+    'GET review/<str:pk>/': (1, 0),
+    'GET reviews/tasks/<int:id>/': (1, 0),
+    'GET task/reviews/<int:id>/': (2, 0),
+    'PATCH finish/<int:id>/': (6, 0),
+    'PATCH cancel/<int:id>/': (8, 0),
+    'POST tasks/bulk/create/': (8, 0),
+    'POST tasks/bulk/finish/': (11, 0),
+    'POST tasks/bulk/cancel/': (11, 0),
+    'GET sectors/stats/': (2, 0),
+    'GET tasks/stats/': (1, 0),
+    'GET managers/stats/': (1, 0),
+    'GET users/stats/': (1, 0),
+    'GET stats/sector/<int:id>/': (2, 0),
+    'GET tasks/sector/<int:id>/': (3, 0),
+    'GET employee/sector/<int:id>/': (2, 0),
+    'GET tasks/export/': (1, 0),
+    'GET employees/stats/export/': (1, 0),
+    'POST reports/': (4, 0),
+    'GET report/<int:pk>/': (1, 0),
+    'GET profiling/': (1, 0),
+    'GET metrics/': (1, 0),
+    'GET user/sector/tasks/<int:id>/': (3, 0),
+    'GET user/director/tasks/<int:id>/': (3, 0),
+    'GET profile/<str:pk>/': (3, 0),
+    'GET employees/stats/<int:id>/': (1, 0),
+    'GET user/profile/': (3, 0),
+    'GET user/stat/': (2, 0),
+    'GET user/sector/tasks/': (2, 0),
+    'GET user/director/tasks/': (2, 0),
+}
+# Rows of each kind ``grow`` adds around the fixture.
+GROWTH = 5
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every API route, called as every role, stays within its ``QUERY_BUDGETS`` entry.
+
+    The scenarios run on a small generated organisation and again after
+    ``grow`` added rows to everything the fixture users see, so a query per
+    row exceeds the budget even when a small page would still fit in it.
+    Caches are cleared before each request: budgets are for cache misses.
+    """
+    roles = [status for status, _ in CustomUser.Status]
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_org', sectors=2, employees=3, tasks=40, prefix='budget', stdout=StringIO())
+
+    def grow(self, fixture):
+        deadline = timezone.now() + timedelta(days=3)
+        for i in range(GROWTH):
+            employee = CustomUser.objects.create(username=f'grown-{i}', sector_id=fixture.sector_id)
+            sector = Sector.objects.create(name=f'grown {i}')
+            CustomUser.objects.create(username=f'grown-manager-{i}', status='manager', sector=sector)
+            for boss in (fixture.manager, fixture.director):
+                for worker in (employee, fixture.employee):
+                    Task.objects.create(problem='Budget', deadline=deadline, boss=boss, employee=worker)
+            review = TaskReview.objects.create(task=fixture.task, user=fixture.manager, content='Budget')
+            TaskReview.objects.create(task=fixture.task, user=fixture.employee, content='Budget', reply=review)
+
+    def query_counts(self, fixture):
+        counts = {}
+        for scenario in SCENARIOS:
+            for role in self.roles:
+                for alias in caches:
+                    caches[alias].clear()
+                if role:
+                    # Authentication reads the user row once per JWT_USER_CACHE_TIMEOUT, not per request.
+                    user_fields(fixture.users[role].pk)
+                response, queries, _ = measure(client_for(fixture, role), scenario, fixture)
+                self.assertLess(response.status_code, 500, f'{scenario.key} as {role}')
+                counts[scenario.key, role] = queries
+        return counts
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(uncovered_routes(), [])
+        self.assertEqual(sorted(QUERY_BUDGETS), sorted(scenario.key for scenario in SCENARIOS))
+
+    def test_budgets(self):
+        small = self.query_counts(Fixture('synthetic'))
+        fixture = Fixture('synthetic')
+        self.grow(fixture)
+        large = self.query_counts(Fixture('synthetic'))
+        for (key, role), queries in small.items():
+            budget, per_row = QUERY_BUDGETS[key]
+            with self.subTest(route=key, role=role):
+                self.assertLessEqual(queries, budget)
+                self.assertLessEqual(large[key, role], budget + per_row * GROWTH)
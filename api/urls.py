@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework_simplejwt import views as jwt_views
 
+from api import views as api_views
 from user import views as user_views
 from task import views as task_views
 
@@ -26,6 +27,8 @@ urlpatterns = [
     path("task/<str:pk>/", task_views.TaskDetailView.as_view(), name='task_detail'),
     path("manager/tasks/", task_views.ManagerTaskListView.as_view(), name='manager_tasks'),
     path("director/tasks/", task_views.DirectorTaskListCreateView.as_view(), name='director_tasks'),
+    path("tasks/changes/", task_views.TaskChangesView.as_view(), name='task_changes'),
+    path("tasks/events/", task_views.TaskEventsView.as_view(), name='task_events'),
 
 # REVIEW FOR THE TASK
     path("reviews/", task_views.TaskReviewListView.as_view(), name='reviews'),
@@ -42,6 +45,11 @@ urlpatterns = [
     path("finish/<int:id>/", task_views.FinishTaskView.as_view(), name='finished'),
     path("cancel/<int:id>/", task_views.CancelTaskView.as_view(), name='canceled'),
 
+# BULK CREATE, FINISH, CANCEL
+    path("tasks/bulk/create/", task_views.BulkTaskCreateView.as_view(), name='tasks_bulk_create'),
+    path("tasks/bulk/finish/", task_views.BulkFinishTaskView.as_view(), name='tasks_bulk_finish'),
+    path("tasks/bulk/cancel/", task_views.BulkCancelTaskView.as_view(), name='tasks_bulk_cancel'),
+
 
 # 1 - Page Barcha ko'rsatkichlar
 
@@ -69,6 +77,14 @@ urlpatterns = [
     # Each sector employee stat
     path("employee/sector/<int:id>/", task_views.EachSectorEmployeeStatView.as_view(), name='sector_employee_stat'),
 
+    # Export tasks and employee stats (CSV / JSON Lines)
+    path("tasks/export/", task_views.TaskExportView.as_view(), name='tasks_export'),
+    path("employees/stats/export/", task_views.EmployeeStatExportView.as_view(), name='employee_stats_export'),
+
+    # Period reports computed in the background
+    path("reports/", task_views.ReportJobCreateView.as_view(), name='reports'),
+    path("report/<int:pk>/", task_views.ReportJobDetailView.as_view(), name='report'),
+
 
 # 3 - Page Shaxsiy kabinet
 
@@ -85,6 +101,11 @@ urlpatterns = [
     path("employees/stats/<int:id>/", user_views.EmployeeStatListView.as_view(), name='employee_stats'),
 
 
+# PROFILING (admins; see api.profiling)
+    path("profiling/", api_views.ProfilingReportView.as_view(), name='profiling'),
+    path("metrics/", api_views.MetricsView.as_view(), name='metrics'),
+
+
 # 4 - page Request User
 
     # request user profile
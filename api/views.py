@@ -1,3 +1,93 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, permissions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-# Create your views here.
+from .profiling import prometheus_text, registry
+
+
+class AsyncAPIView(View):
+    """
+    Read-only counterpart of DRF's ``APIView`` whose handlers run on the event loop.
+
+    DRF views are sync-only, so under ASGI each of them holds a worker thread
+    for the whole request. Handlers here are ``async def`` and use the async
+    ORM; only authentication and permission checks, which may load the user,
+    run in a thread, with the same DRF classes as every other view.
+    Handlers return DRF ``Response`` objects, which are rendered as JSON.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    filter_backends = ()
+    renderer_class = JSONRenderer
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            self.request = await sync_to_async(self.initial)(request)
+            response = await super().dispatch(self.request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(response)
+
+    def initial(self, request):
+        request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        # Authenticate here, in the thread, rather than lazily inside a handler.
+        request.user
+        for permission in self.permission_classes:
+            permission = permission()
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+        return request
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = self.authentication_classes[0]().authenticate_header(self.request)
+        response = api_settings.EXCEPTION_HANDLER(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = self.renderer_class()
+            response.accepted_media_type = response.accepted_renderer.media_type
+            response.renderer_context = {'view': self, 'request': self.request, 'response': response}
+            response.render()
+        return response
+
+
+class ProfilingReportView(APIView):
+    """Per-endpoint latency and query statistics of this process, slowest p95 first."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'since': registry.started,
+            'endpoints': registry.report(),
+        })
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=204)
+
+
+class MetricsView(APIView):
+    """The profiling statistics for Prometheus."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
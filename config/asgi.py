@@ -3,6 +3,22 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The dashboard stats views (``api.views.AsyncAPIView`` subclasses) are async
+and keep many requests in flight per worker while they wait on the database
+or the cache; every other view runs in uvicorn's thread pool as under WSGI.
+Serve it with uvicorn workers under gunicorn, see ``config/gunicorn.py``:
+
+    SERVER_MODE=asgi gunicorn config.asgi -c config/gunicorn.py
+
+or a single uvicorn process for development:
+
+    uvicorn config.asgi:application --reload
+
+The task push stream (``/api/tasks/events/``, see ``task.events``) only works
+here: each open stream is a coroutine waiting on Redis pub/sub, not a thread.
+CSV/JSON Lines exports hand Django an async iterator here (``task.export``),
+which it streams; a sync one would be read whole before the first byte.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -10,10 +10,25 @@ app.config_from_object(
     'django.conf:settings', namespace='CELERY'
 )
 
+# Celery's Django fixup closes unusable or obsolete connections before and
+# after every task, so workers reuse theirs across tasks under the same
+# CONN_MAX_AGE / CONN_HEALTH_CHECKS as the web processes; a connection broken
+# mid-task is dropped at the end of it instead of failing the next one.
+
 app.conf.beat_schedule = {
+    # Deadlines are applied by per-task jobs (task.scheduler); this hourly
+    # sweep only catches the ones that were lost.
     'update_task_missed': {
         'task': 'task.tasks.update_task_missed',
-        'schedule': crontab(minute='*/2')
+        'schedule': crontab(minute=5)
+    },
+    'purge_task_tombstones': {
+        'task': 'task.tasks.purge_task_tombstones',
+        'schedule': crontab(hour=3, minute=45)
+    },
+    'flush_expired_tokens': {
+        'task': 'user.tasks.flush_expired_tokens',
+        'schedule': crontab(hour=3, minute=30)
     },
 }
 
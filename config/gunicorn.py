@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for both deployment modes.
+
+WSGI, sync workers, one request per worker (or per thread with ``GUNICORN_THREADS``):
+
+    gunicorn config.wsgi -c config/gunicorn.py
+
+ASGI, uvicorn workers running the async stats views on an event loop:
+
+    SERVER_MODE=asgi gunicorn config.asgi -c config/gunicorn.py
+
+Django reads SERVER_MODE too: ASGI workers don't keep persistent database
+connections, so put a PgBouncer in front of Postgres and set DB_POOLED=True.
+
+Compare the two with ``python manage.py benchmark_servers``.
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+accesslog = '-'
+
+if SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    threads = int(os.environ.get('GUNICORN_THREADS', 1))
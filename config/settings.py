@@ -49,12 +49,29 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
 
-        'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+        'DEFAULT_AUTHENTICATION_CLASSES': ('user.authentication.ClaimsJWTAuthentication',),
         'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.AllowAny',),
         'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
 
 }
 
+# Task lists are cursor-paginated, see task.pagination.
+TASK_PAGE_SIZE = env.int('TASK_PAGE_SIZE', default=50)
+TASK_MAX_PAGE_SIZE = env.int('TASK_MAX_PAGE_SIZE', default=500)
+
+# Change feed, see task.feed: tombstones of deleted tasks are kept this many days
+# (older cursors must reload), and changes younger than the settle time wait for the next poll.
+TASK_TOMBSTONE_DAYS = env.int('TASK_TOMBSTONE_DAYS', default=30)
+TASK_FEED_SETTLE_SECONDS = env.float('TASK_FEED_SETTLE_SECONDS', default=1)
+
+# Task change push, see task.events: the Redis pub/sub server (empty disables publishing),
+# seconds between keep-alive comments, seconds before a stream is closed for the client to reconnect
+# and seconds a request waits on Redis to publish (or a stream to connect) before giving up.
+TASK_EVENTS_REDIS_URL = env('TASK_EVENTS_REDIS_URL', default=env('REDIS_URL', default='redis://localhost:6379/1'))
+TASK_EVENTS_HEARTBEAT = env.int('TASK_EVENTS_HEARTBEAT', default=15)
+TASK_EVENTS_MAX_AGE = env.int('TASK_EVENTS_MAX_AGE', default=300)
+TASK_EVENTS_REDIS_TIMEOUT = env.float('TASK_EVENTS_REDIS_TIMEOUT', default=0.5)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -87,10 +104,10 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.RoleTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
-    "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "user.serializers.RedisTokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
@@ -104,8 +121,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'task.audit.AuditActorMiddleware',
+    'api.profiling.ProfilingMiddleware',
 ]
 
+# Share of requests profiled by api.profiling (0 to 1); 0 leaves the middleware out.
+PROFILING_SAMPLE_RATE = env.float('PROFILING_SAMPLE_RATE', default=0.0)
+# Latency samples kept per endpoint for the percentiles.
+PROFILING_WINDOW = env.int('PROFILING_WINDOW', default=1000)
+# A statement run this many times in one request is reported as a likely N+1.
+PROFILING_DUPLICATE_THRESHOLD = env.int('PROFILING_DUPLICATE_THRESHOLD', default=5)
+
 CORS_ORIGIN_ALLOW_ALL = True
 
 CORS_ALLOWED_ORIGINS = [
@@ -163,18 +189,49 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOLED=True when HOST/DB_PORT point at a PgBouncer-style pooler in
+# transaction mode. A server-side cursor can't outlive the transaction there,
+# so every .iterator() runs inside transaction.atomic() (task.export,
+# user.tokens.load_blacklist): without one Django declares the cursor WITH HOLD.
+DB_POOLED = env.bool('DB_POOLED', default=False)
+
+# Persistent connections are reused by the thread that opened them. ASGI runs
+# every request in a fresh thread, so there they would only pile up: use the
+# pooler instead (SERVER_MODE is set for gunicorn, see config/gunicorn.py).
+SERVER_MODE = env('SERVER_MODE', default='wsgi')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': env("NAME"),
         'USER': env("USER"),
-        'PORT': 5432,
+        'PORT': env.int('DB_PORT', default=6432 if DB_POOLED else 5432),
         'HOST': env("HOST"),
         'PASSWORD': env("PASSWORD"),
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 60),
+        'CONN_HEALTH_CHECKS': env.bool('CONN_HEALTH_CHECKS', default=True),
     }
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_URL', default='redis://localhost:6379/1'),
+    },
+    # Per-process, for data that may be briefly stale but is read on every request.
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Seconds a process keeps the full row of a token-authenticated user, see user.authentication.
+JWT_USER_CACHE_TIMEOUT = env.int('JWT_USER_CACHE_TIMEOUT', default=30)
+
+# Write TaskUpdateTimes rows for the status changes made by update_task_missed and the bulk views.
+TASK_SWEEP_AUDIT = env.bool('TASK_SWEEP_AUDIT', default=True)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
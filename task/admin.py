@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Task, TaskReview, TaskUpdateTimes
+from .models import ReportJob, Task, TaskReview, TaskStat, TaskUpdateTimes
 
 
 admin.site.register(Task)
 admin.site.register(TaskUpdateTimes)
 admin.site.register(TaskReview)
+admin.site.register(TaskStat)
+admin.site.register(ReportJob)
@@ -0,0 +1,105 @@
+"""
+Buffered writer of the ``TaskUpdateTimes`` history.
+
+``record`` collects rows per transaction (per savepoint, so rows of a
+rolled-back savepoint are dropped with it) and writes each batch with one
+``bulk_create`` once the transaction commits. Rows are attributed to the
+user of the current request, which ``AuditActorMiddleware`` makes available
+to model code; outside a request (Celery, management commands) the actor is
+empty.
+
+Django has no public way to tell which savepoint is current or whether a
+callback given to ``on_commit`` is still pending, so ``_scope`` and
+``_pending`` read the connection's ``savepoint_ids`` and ``run_on_commit``.
+Both are private but unchanged through Django 4.2, which requirements.txt
+pins; ``TaskAuditTest.test_django_internals`` fails on a version where they
+differ.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import transaction
+
+from .models import TaskUpdateTimes
+
+_request = ContextVar('task_audit_request', default=None)
+
+
+class AuditActorMiddleware:
+    """Keep the current request reachable from ``actor_id`` for its whole handling."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def actor_id():
+    """The user of the current request; DRF sets ``request.user`` on the Django request it wraps."""
+    user = getattr(_request.get(), 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class Batch:
+    """History rows of one transaction or savepoint, written on commit; registered in ``batches`` under ``key``."""
+
+    def __init__(self, batches, key):
+        self.rows = []
+        self.batches = batches
+        self.key = key
+
+    def __call__(self):
+        if self.batches.get(self.key) is self:
+            del self.batches[self.key]
+        rows, self.rows = self.rows, []
+        TaskUpdateTimes.objects.bulk_create(rows)
+
+
+def record(task_ids, fields):
+    """Add a history row per task in ``task_ids``, changed in ``fields`` by the current actor."""
+    user_id = actor_id()
+    rows = [TaskUpdateTimes(task_id=pk, updated_by_id=user_id, fields=fields) for pk in task_ids]
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        TaskUpdateTimes.objects.bulk_create(rows)
+        return
+    batches = connection.__dict__.setdefault('task_audit_batches', {})
+    key = _scope(connection)
+    pending = _pending(connection)
+    if id(batches.get(key)) not in pending:
+        # Committed batches remove themselves; rolled-back ones are no longer among the callbacks.
+        for stale in [stale for stale, batch in batches.items() if id(batch) not in pending]:
+            del batches[stale]
+        batches[key] = Batch(batches, key)
+        transaction.on_commit(batches[key])
+    batches[key].rows.extend(rows)
+
+
+def _scope(connection):
+    """The savepoints of the current atomic block, outermost first."""
+    return tuple(connection.savepoint_ids)
+
+
+def _pending(connection):
+    """Ids of the ``on_commit`` callbacks not discarded by a rollback."""
+    return {id(func) for _, func, _ in connection.run_on_commit}
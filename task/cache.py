@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import make_etag, not_modified, set_validators
+
+STATS_VERSION_KEY = 'task:stats-version'
+USERS_VERSION_KEY = 'task:users-version'
+STATS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def stats_version():
+    """Version stamp of the data behind the stats endpoints."""
+    return _version(STATS_VERSION_KEY)
+
+
+astats_version = sync_to_async(stats_version)
+
+
+def bump_stats_version():
+    """Invalidate every cached stats response once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(STATS_VERSION_KEY))
+
+
+def users_version():
+    """Version stamp of the users, whose names task responses carry."""
+    return _version(USERS_VERSION_KEY)
+
+
+def bump_users_version():
+    transaction.on_commit(lambda: _bump(USERS_VERSION_KEY))
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start above any version used before the key was evicted.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def cache_stats(get):
+    """
+    Serve a stats view's ``get`` from the cache until the stats version changes.
+
+    The key holds the version and the full path, so query parameters get their
+    own entries and a bump makes all of them unreachable at once. The same pair
+    is the response's ETag, so clients holding it get a 304 straight away.
+    Works on both sync handlers and the ``async def`` ones of ``AsyncAPIView``.
+    """
+    if asyncio.iscoroutinefunction(get):
+        return _cache_stats_async(get)
+
+    @wraps(get)
+    def wrapper(view, request, *args, **kwargs):
+        etag, key = _entry(request, stats_version())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        data = cache.get(key)
+        if data is not None:
+            return set_validators(Response(data), etag)
+        response = get(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, STATS_CACHE_TIMEOUT)
+            set_validators(response, etag)
+        return response
+
+    return wrapper
+
+
+def _cache_stats_async(get):
+    @wraps(get)
+    async def wrapper(view, request, *args, **kwargs):
+        etag, key = _entry(request, await astats_version())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        data = await cache.aget(key)
+        if data is not None:
+            return set_validators(Response(data), etag)
+        response = await get(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, STATS_CACHE_TIMEOUT)
+            set_validators(response, etag)
+        return response
+
+    return wrapper
+
+
+def _entry(request, version):
+    """ETag and cache key of a stats response."""
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return make_etag(version, path), f'task:stats:{version}:{path}'
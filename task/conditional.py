@@ -0,0 +1,24 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def not_modified(request, etag):
+    """
+    The ``304 Not Modified`` response when the client's ETag still matches, else ``None``.
+
+    Check before doing any serialization. There is no ``Last-Modified``: task
+    responses also change with the date and with other rows (users' names),
+    which no single timestamp covers.
+    """
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    return response
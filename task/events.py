@@ -0,0 +1,109 @@
+"""
+Push of task changes to open dashboards, as server-sent events.
+
+Saves and bulk transitions ``publish`` their changes to a Redis channel when
+their transaction commits; every ASGI worker ``stream``s the channel to its
+connected clients, each filtered by ``task.feed.sees``. Event ids are change
+feed cursors: a reconnecting client is told to catch up from its
+``Last-Event-ID`` with ``/api/tasks/changes/``.
+"""
+import json
+import logging
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .feed import encode_cursor, sees
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'task:events'
+# Milliseconds browsers wait before reconnecting a closed stream.
+RETRY = 3000
+
+_client = None
+
+
+def client():
+    global _client
+    if _client is None:
+        # Publishing runs in the request: an unreachable Redis must not hold it up.
+        timeout = settings.TASK_EVENTS_REDIS_TIMEOUT
+        _client = redis.Redis.from_url(settings.TASK_EVENTS_REDIS_URL, socket_connect_timeout=timeout,
+                                       socket_timeout=timeout)
+    return _client
+
+
+def change(pk, boss_id, employee_id, status, previous_status, updated):
+    """The event of task ``pk`` saved with ``status``, which was ``previous_status`` before."""
+    return {
+        'id': pk,
+        'status': status,
+        'previous_status': previous_status,
+        'updated': updated,
+        'cursor': encode_cursor(updated, pk),
+        'boss_id': boss_id,
+        'employee_id': employee_id,
+    }
+
+
+def publish(changes):
+    """Send ``changes`` once the current transaction commits; nothing if it rolls back."""
+    if not changes or not settings.TASK_EVENTS_REDIS_URL:
+        return
+    payload = json.dumps(changes, cls=DjangoJSONEncoder)
+    transaction.on_commit(lambda: send(payload))
+
+
+def send(payload):
+    try:
+        client().publish(CHANNEL, payload)
+    except redis.RedisError:
+        # Clients still catch up through the change feed.
+        logger.warning('Task events could not be published', exc_info=True)
+
+
+def message(event, data, id=None):
+    lines = [f'id: {id}'] if id else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream(user, last_event_id=None):
+    """
+    Server-sent events of the changes ``user`` sees, for ``TASK_EVENTS_MAX_AGE`` seconds.
+
+    Streams end on their own and browsers reconnect, so a connection whose
+    client went away is dropped within that time even if no write fails.
+    """
+    # Only the connect is bounded: reads wait up to a heartbeat for a message.
+    connection = redis.asyncio.Redis.from_url(settings.TASK_EVENTS_REDIS_URL,
+                                              socket_connect_timeout=settings.TASK_EVENTS_REDIS_TIMEOUT)
+    pubsub = connection.pubsub()
+    try:
+        await pubsub.subscribe(CHANNEL)
+        yield f'retry: {RETRY}\n\n'
+        if last_event_id:
+            # Subscribed first, so nothing falls between the catch-up and the live events.
+            yield message('resync', {'since': last_event_id})
+        end = time.monotonic() + settings.TASK_EVENTS_MAX_AGE
+        last_write = time.monotonic()
+        while time.monotonic() < end:
+            received = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                timeout=settings.TASK_EVENTS_HEARTBEAT)
+            if received is not None:
+                for event in json.loads(received['data']):
+                    if sees(user, event):
+                        last_write = time.monotonic()
+                        yield message('task', event, id=event['cursor'])
+            if time.monotonic() - last_write >= settings.TASK_EVENTS_HEARTBEAT:
+                # Keeps proxies from closing an idle stream.
+                last_write = time.monotonic()
+                yield ': ping\n\n'
+    finally:
+        await pubsub.close()
+        await connection.close()
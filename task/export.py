@@ -0,0 +1,107 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+EXPORT_CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Exported column -> Task lookup.
+TASK_COLUMNS = {
+    'id': 'id',
+    'problem': 'problem',
+    'reason': 'reason',
+    'event': 'event',
+    'deadline': 'deadline',
+    'boss': 'boss__username',
+    'employee': 'employee__username',
+    'sector': 'employee_sector__name',
+    'status': 'status',
+    'is_changed': 'is_changed',
+    'financial_help': 'financial_help',
+    'created_at': 'created_at',
+    'updated': 'updated',
+}
+
+
+class Echo:
+    """File-like object whose ``write`` returns the line, so ``csv.writer`` can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def lines(columns, rows, kind):
+    """Encode ``rows`` (tuples in ``columns`` order) as CSV or JSON Lines, one line at a time."""
+    if kind == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def in_transaction(lines):
+    """
+    Produce ``lines`` inside one transaction.
+
+    Its server-side cursor then lives only as long as the transaction, which
+    a transaction-mode pooler (``DB_POOLED``) keeps on one server connection;
+    outside a transaction Django would declare it ``WITH HOLD``.
+    """
+    with transaction.atomic():
+        yield from lines
+
+
+async def in_thread(lines):
+    """
+    Produce ``lines`` in the request's thread, ``EXPORT_CHUNK_SIZE`` at a time.
+
+    Django buffers a synchronous iterator of a streaming response under ASGI
+    before sending any of it; an asynchronous one is streamed. The thread is
+    the one ``sync_to_async`` gives every call of a request, so the transaction
+    and its cursor stay on its connection.
+    """
+    take = sync_to_async(lambda: ''.join(islice(lines, EXPORT_CHUNK_SIZE)))
+    try:
+        while chunk := await take():
+            yield chunk
+    finally:
+        await sync_to_async(lines.close)()
+
+
+def task_rows(tasks):
+    """Rows of ``tasks`` in ``TASK_COLUMNS`` order, read through a server-side cursor."""
+    return tasks.values_list(*TASK_COLUMNS.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_kind(request):
+    kind = request.query_params.get('type', 'csv')
+    if kind not in CONTENT_TYPES:
+        raise ValidationError(
+            {
+                'status': False,
+                'message': "Fayl turi csv yoki jsonl bo'lishi kerak !"
+            }
+        )
+    return kind
+
+
+def export_response(request, columns, rows, kind, filename):
+    content = in_transaction(lines(columns, rows, kind))
+    if isinstance(request._request, ASGIRequest):
+        content = in_thread(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[kind])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{kind}"'
+    return response
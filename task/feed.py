@@ -0,0 +1,103 @@
+"""
+Incremental sync: the tasks a user sees that changed after a cursor.
+
+A cursor is ``<microseconds since the epoch>-<task id>`` of the last change a
+client has seen. Changes are tasks, by ``(updated, id)``, and tombstones of
+deactivated (``is_active=False``) or deleted tasks, by ``(deleted_at,
+task_id)``; both are read in one keyset order, so a page never skips or
+repeats a change.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task, TaskTombstone
+from .serializers import TaskSerializer
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment, pk):
+    return f'{(moment - EPOCH) // MICROSECOND}-{pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, pk = cursor.split('-')
+        return EPOCH + int(micros) * MICROSECOND, int(pk)
+    except (ValueError, OverflowError):
+        raise InvalidCursor(cursor)
+
+
+def scope(user):
+    """The same rows the role's task views list: everything for directors and admins, own tasks otherwise."""
+    if user.status in ('director', 'admin'):
+        return Q()
+    if user.status == 'manager':
+        return Q(boss_id=user.pk) | Q(employee_id=user.pk)
+    return Q(employee_id=user.pk)
+
+
+def sees(user, task):
+    """``scope`` for one task, given as a mapping with ``boss_id`` and ``employee_id``."""
+    if user.status in ('director', 'admin'):
+        return True
+    if user.status == 'manager' and task['boss_id'] == user.pk:
+        return True
+    return task['employee_id'] == user.pk
+
+
+def after(time_field, id_field, cursor):
+    if cursor is None:
+        return Q()
+    moment, pk = cursor
+    return Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, f'{id_field}__gt': pk})
+
+
+def expired(cursor):
+    """Whether tombstones after ``cursor`` may have been purged already."""
+    return cursor[0] < timezone.now() - timedelta(days=settings.TASK_TOMBSTONE_DAYS)
+
+
+def changes(user, cursor, limit):
+    """
+    Up to ``limit`` changes after ``cursor`` (``None``: from the start) as ``(tasks, tombstones, next, has_more)``.
+
+    Rows changed in the last ``TASK_FEED_SETTLE_SECONDS`` are left for the
+    next poll: a transaction that has not committed yet may still write a
+    change stamped earlier than them. Once everything before that horizon
+    has been returned, the cursor moves up to it, so a user whose tasks
+    rarely change keeps a recent cursor rather than one that expires.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.TASK_FEED_SETTLE_SECONDS)
+    visible = scope(user)
+    tasks = Task.objects.filter(visible & after('updated', 'id', cursor) & Q(updated__lt=horizon))
+    tasks = TaskSerializer.setup_eager_loading(tasks.order_by('updated', 'id'))[:limit + 1]
+    deleted = TaskTombstone.objects.filter(visible & after('deleted_at', 'task_id', cursor) &
+                                           Q(deleted_at__lt=horizon))
+    deleted = deleted.order_by('deleted_at', 'task_id').values_list('deleted_at', 'task_id')[:limit + 1]
+
+    merged = sorted([(task.updated, task.pk, task) for task in tasks] +
+                    [(moment, pk, None) for moment, pk in deleted], key=lambda change: change[:2])
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    active, tombstones = [], []
+    for moment, pk, task in merged:
+        if task is None:
+            tombstones.append({'id': pk, 'reason': 'deleted', 'at': moment})
+        elif task.is_active:
+            active.append(task)
+        else:
+            tombstones.append({'id': pk, 'reason': 'deactivated', 'at': moment})
+    if has_more:
+        last_moment, last_pk, _ = merged[-1]
+        return active, tombstones, (last_moment, last_pk), True
+    return active, tombstones, (horizon, 0), False
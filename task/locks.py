@@ -0,0 +1,73 @@
+"""
+Locks shared by all workers, kept where the default cache keeps its data.
+
+On the Redis cache a lock is a ``redis.lock.Lock``: taken with ``SET NX PX``
+and released by a script that deletes the key only while it still holds the
+holder's token, so a holder whose lock expired cannot delete the one another
+worker has taken since. Other cache backends have no compare-and-delete;
+there (local memory in development) the token is read back before the delete.
+"""
+from contextlib import contextmanager
+from uuid import uuid4
+
+import redis
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from redis.exceptions import LockNotOwnedError
+
+REDIS_CACHE = 'django.core.cache.backends.redis.RedisCache'
+
+_client = None
+
+
+def client():
+    """Redis server of the default cache, or ``None`` when the cache is not Redis."""
+    global _client
+    config = settings.CACHES[DEFAULT_CACHE_ALIAS]
+    if config['BACKEND'] != REDIS_CACHE:
+        return None
+    if _client is None:
+        location = config['LOCATION']
+        servers = location.split(',') if isinstance(location, str) else location
+        # Like RedisCache, write to the first server.
+        _client = redis.Redis.from_url(servers[0])
+    return _client
+
+
+@contextmanager
+def cache_lock(key, timeout):
+    """Hold ``key`` for at most ``timeout`` seconds without waiting for it; yields whether it was taken."""
+    redis_client = client()
+    if redis_client is None:
+        yield from _token_lock(key, timeout)
+        return
+    lock = redis_client.lock(key, timeout=timeout, blocking=False)
+    acquired = lock.acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except LockNotOwnedError:
+                # Expired, and possibly taken by another worker since; that one is theirs.
+                pass
+
+
+def _token_lock(key, timeout):
+    token = uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def break_lock(key):
+    """Free ``key`` whoever holds it."""
+    redis_client = client()
+    if redis_client is None:
+        cache.delete(key)
+    else:
+        redis_client.delete(key)
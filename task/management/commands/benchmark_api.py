@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmark import MissingData, compare, run, uncovered_routes
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every API route and update_task_missed in process against the data of generate_org: '
+            'latency percentiles, throughput and query counts. Nothing is written.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per route.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per route first.')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument('--only', help='Only routes containing this text.')
+        parser.add_argument('--password', default='synthetic', help='Password of the generated users, for login/.')
+        parser.add_argument('--output', help='Write the results as JSON to this file, e.g. a baseline.')
+        parser.add_argument('--compare', help='Baseline JSON to compare against; regressions fail the command.')
+        parser.add_argument('--tolerance', type=float, default=20,
+                            help='Allowed p95 slowdown against the baseline, in percent.')
+
+    def handle(self, *args, **options):
+        for route in uncovered_routes():
+            self.stderr.write(self.style.WARNING(f'No benchmark scenario for {route}'))
+
+        self.stdout.write(f'{"route":<40} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8} {"queries":>8}')
+
+        def progress(key, result):
+            self.stdout.write(
+                f'{key:<40} {result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} '
+                f'{result["throughput_rps"]:>8.1f} {result["queries"]:>8}'
+            )
+
+        try:
+            results = run(options['password'], options['iterations'], options['warmup'],
+                          options['cold_cache'], options['only'], progress)
+        except MissingData as exc:
+            raise CommandError(exc)
+        results['meta'] = {
+            'vendor': connection.vendor,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'cold_cache': options['cold_cache'],
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
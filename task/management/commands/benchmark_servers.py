@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import percentile
+
+DEFAULT_PATHS = ['/api/tasks/stats/', '/api/sectors/stats/', '/api/users/stats/', '/api/managers/stats/']
+
+
+class Command(BaseCommand):
+    help = ('Load the dashboard endpoints of running deployments with concurrent requests, '
+            'e.g. a WSGI and an ASGI one, and compare throughput and latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', metavar='LABEL=URL',
+                            help='Deployments to compare, e.g. wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f'Endpoint to load, repeatable. Default: {", ".join(DEFAULT_PATHS)}')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Requests kept in flight at once.')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Requests per endpoint and deployment.')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer header.')
+        parser.add_argument('--miss-cache', action='store_true',
+                            help='Add a unique query parameter to every request so the stats cache never answers it.')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            label, sep, url = target.partition('=')
+            if not sep:
+                raise CommandError(f'Expected LABEL=URL, got "{target}".')
+            targets.append((label, url.rstrip('/')))
+        headers = {'Authorization': f'Bearer {options["token"]}'} if options['token'] else {}
+
+        self.stdout.write(f'{"target":<10} {"path":<28} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for label, url in targets:
+            for path in options['paths'] or DEFAULT_PATHS:
+                result = self.run(url + path, headers, options)
+                self.stdout.write(
+                    f'{label:<10} {path:<28} {result["rps"]:>8.1f} {result["p50"]:>8.1f} '
+                    f'{result["p95"]:>8.1f} {result["p99"]:>8.1f} {result["errors"]:>7}'
+                )
+
+    def run(self, url, headers, options):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=options['concurrency'])
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        def fetch(n):
+            params = {'bench': n} if options['miss_cache'] else None
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, params=params).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency * 1000 for latency, ok in results if ok)
+        return {
+            'rps': len(results) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'errors': sum(1 for _, ok in results if not ok),
+        }
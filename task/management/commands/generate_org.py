@@ -0,0 +1,168 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from task.cache import bump_stats_version
+from task.models import Task, TaskReview, TaskUpdateTimes
+from task.rollup import record_created
+from user.models import CustomUser, Sector
+from user.org import forget_org_structure
+
+BATCH_SIZE = 2000
+
+FIRST_NAMES = ['Aziz', 'Bekzod', 'Dilnoza', 'Farrux', 'Gulnora', 'Jasur', 'Kamola', 'Laziz', 'Malika',
+               'Nodir', 'Oybek', 'Shahnoza', 'Sardor', 'Umida', 'Zafar']
+LAST_NAMES = ['Aliyev', 'Karimov', 'Rahimov', 'Tursunov', 'Yusupov', 'Saidova', 'Qodirova', 'Ergasheva']
+PROBLEMS = ["Hisobotni tayyorlash", "Shartnomani ko'rib chiqish", "Yig'ilish bayonnomasini yozish",
+            "Ma'lumotlar bazasini yangilash", "Mijoz murojaatiga javob berish", "Xarajatlar smetasini tuzish"]
+REVIEWS = ["Bajarilmoqda", "Qo'shimcha ma'lumot kerak", "Muddatni uzaytirish mumkinmi?", "Tayyor, tekshiring",
+           "Rahmat", "Tuzatish kiritildi"]
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a synthetic organisation: sectors, users of every role and tasks '
+            'with reviews and update history, for load tests and benchmarks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sectors', type=int, default=10)
+        parser.add_argument('--directors', type=int, default=1)
+        parser.add_argument('--admins', type=int, default=1, help='Admins are staff users too.')
+        parser.add_argument('--managers', type=int, default=1, help='Managers per sector.')
+        parser.add_argument('--employees', type=int, default=20, help='Employees per sector.')
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument('--reviews', type=float, default=2, help='Average reviews per task.')
+        parser.add_argument('--updates', type=float, default=1, help='Average update records per task.')
+        parser.add_argument('--overdue', type=float, default=0.05,
+                            help='Share of past-deadline tasks left "doing" for update_task_missed to find.')
+        parser.add_argument('--days', type=int, default=180, help='Tasks are created over this many past days.')
+        parser.add_argument('--prefix', default='synthetic', help='Username and sector name prefix.')
+        parser.add_argument('--password', default='synthetic', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users prefixed "{prefix}-" exist already, pick another --prefix.')
+        if options['sectors'] < 1 or options['employees'] < 1 or options['directors'] < 1:
+            raise CommandError('At least one sector, one employee per sector and one director are needed.')
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+
+        with transaction.atomic():
+            sectors = Sector.objects.bulk_create(
+                [Sector(name=f'{prefix} {i}') for i in range(1, options['sectors'] + 1)]
+            )
+            users = self.create_users(sectors, options)
+            tasks = self.create_tasks(users, options)
+            reviews = self.create_reviews(tasks, options['reviews'])
+            updates = self.create_updates(tasks, options['updates'])
+            # bulk_create sends no signals, do what the receivers would.
+            forget_org_structure()
+            bump_stats_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(sectors)} sector(s), {sum(map(len, users.values()))} user(s), {len(tasks)} task(s), '
+            f'{reviews} review(s) and {updates} update record(s).'
+        ))
+
+    def create_users(self, sectors, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        rows = []
+
+        def add(username, status, sector=None, is_staff=False):
+            rows.append(CustomUser(
+                username=f'{prefix}-{username}', password=password, status=status, sector=sector,
+                is_staff=is_staff, first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+            ))
+
+        for i in range(1, options['directors'] + 1):
+            add(f'director-{i}', 'director')
+        for i in range(1, options['admins'] + 1):
+            add(f'admin-{i}', 'admin', is_staff=True)
+        for s, sector in enumerate(sectors, 1):
+            for i in range(1, options['managers'] + 1):
+                add(f's{s}-manager-{i}', 'manager', sector)
+            for i in range(1, options['employees'] + 1):
+                add(f's{s}-employee-{i}', 'employee', sector)
+
+        users = {}
+        for user in CustomUser.objects.bulk_create(rows, batch_size=BATCH_SIZE):
+            users.setdefault(user.status, []).append(user)
+        return users
+
+    def create_tasks(self, users, options):
+        rng = self.rng
+        bosses = users['director'] + users.get('admin', [])
+        managers = {}
+        for manager in users.get('manager', []):
+            managers.setdefault(manager.sector_id, []).append(manager)
+
+        tasks, dates = [], []
+        for _ in range(options['tasks']):
+            employee = rng.choice(users['employee'])
+            sector_managers = managers.get(employee.sector_id)
+            boss = rng.choice(sector_managers) if sector_managers and rng.random() < 0.6 else rng.choice(bosses)
+            created = self.now - timedelta(days=rng.uniform(0, options['days']))
+            deadline = created + timedelta(days=rng.randint(1, 30))
+            if deadline < self.now:
+                status = 'doing' if rng.random() < options['overdue'] else rng.choices(
+                    ['finished', 'canceled', 'missed'], [60, 10, 25])[0]
+            else:
+                status = rng.choices(['doing', 'finished', 'canceled'], [80, 15, 5])[0]
+            tasks.append(Task(
+                problem=rng.choice(PROBLEMS), deadline=deadline, boss=boss, employee=employee, status=status,
+                financial_help=rng.random() < 0.1, is_changed=rng.random() < 0.1,
+                boss_status=boss.status, employee_sector_id=employee.sector_id,
+            ))
+            dates.append(created)
+
+        Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        # auto_now_add/auto_now stamp the insert time, backdate afterwards.
+        for task, created in zip(tasks, dates):
+            task.created_at = task.updated = created
+        Task.objects.bulk_update(tasks, ['created_at', 'updated'], batch_size=BATCH_SIZE)
+        record_created(tasks)
+        return tasks
+
+    def count(self, average):
+        """A per-task count averaging ``average``."""
+        return int(average) + (self.rng.random() < average % 1)
+
+    def create_reviews(self, tasks, average):
+        rng = self.rng
+        reviews = []
+        for task in tasks:
+            for _ in range(self.count(average)):
+                reviews.append(TaskReview(
+                    task=task, user=rng.choice([task.boss, task.employee]), content=rng.choice(REVIEWS),
+                ))
+        TaskReview.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+
+        # Some of them answer an earlier review of the same task.
+        replies, previous = [], {}
+        for review in reviews:
+            if review.task_id in previous and rng.random() < 0.3:
+                review.reply = previous[review.task_id]
+                replies.append(review)
+            previous[review.task_id] = review
+        TaskReview.objects.bulk_update(replies, ['reply'], batch_size=BATCH_SIZE)
+        return len(reviews)
+
+    def create_updates(self, tasks, average):
+        rng = self.rng
+        updates, dates = [], []
+        for task in tasks:
+            for _ in range(self.count(average)):
+                updates.append(TaskUpdateTimes(task=task, updated_by=rng.choice([task.boss, task.employee]),
+                                               fields=[rng.choice(['status', 'deadline', 'problem'])]))
+                dates.append(min(self.now, task.created_at + timedelta(days=rng.uniform(0, 10))))
+        TaskUpdateTimes.objects.bulk_create(updates, batch_size=BATCH_SIZE)
+        for update, created in zip(updates, dates):
+            update.created = created
+        TaskUpdateTimes.objects.bulk_update(updates, ['created'], batch_size=BATCH_SIZE)
+        return len(updates)
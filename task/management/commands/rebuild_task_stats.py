@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from task.models import TaskStat
+from task.rollup import KEY_FIELDS, actual_counts, create_stats, stored_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TaskStat rollup from the task table and report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report the drift, do not rewrite the rollup.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actual = actual_counts()
+            stored = stored_counts()
+            drift = {key: (stored.get(key, 0), actual.get(key, 0))
+                     for key in actual.keys() | stored.keys()
+                     if stored.get(key, 0) != actual.get(key, 0)}
+            for key, (was, should_be) in sorted(drift.items(), key=str):
+                fields = ', '.join(f'{name}={value}' for name, value in zip(KEY_FIELDS, key))
+                self.stdout.write(f'{fields}: {was} -> {should_be}')
+
+            if options['check']:
+                self.stdout.write(f'{len(drift)} drifted bucket(s).')
+                return
+
+            TaskStat.objects.all().delete()
+            create_stats(actual)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(actual)} bucket(s), {len(drift)} had drifted.'
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.1 on 2026-10-18 10:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_task_stats(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    TaskStat = apps.get_model('task', 'TaskStat')
+    rows = Task.objects.values_list(
+        'employee__sector', 'employee', 'boss__status', 'status', 'is_changed', 'is_active',
+    ).annotate(count=models.Count('id')).order_by()
+    TaskStat.objects.bulk_create(
+        TaskStat(sector_id=sector_id, employee_id=employee_id, boss_status=boss_status,
+                 status=status, is_changed=is_changed, is_active=is_active, count=count)
+        for sector_id, employee_id, boss_status, status, is_changed, is_active, count in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('user', '0002_alter_customuser_status'),
+        ('task', '0003_taskreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('boss_status', models.CharField(max_length=15)),
+                ('status', models.CharField(choices=[('missed', 'Missed'), ('doing', 'Doing'), ('finished', 'Finished'), ('canceled', 'Canceled'), ('changed', 'Changed')], max_length=10)),
+                ('is_changed', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('count', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+                ('sector', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='user.sector')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='taskstat',
+            constraint=models.UniqueConstraint(fields=('sector', 'employee', 'boss_status', 'status', 'is_changed', 'is_active'), name='task_stat_unique_key'),
+        ),
+        migrations.RunPython(fill_task_stats, migrations.RunPython.noop),
+    ]
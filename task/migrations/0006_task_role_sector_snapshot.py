@@ -0,0 +1,43 @@
+# Generated by Django 4.2.1 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_snapshots(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    CustomUser = apps.get_model('user', 'CustomUser')
+    users = CustomUser.objects.filter(pk=models.OuterRef('boss'))
+    Task.objects.update(boss_status=models.Subquery(users.values('status')[:1]))
+    users = CustomUser.objects.filter(pk=models.OuterRef('employee'))
+    Task.objects.update(employee_sector=models.Subquery(users.values('sector')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_customuser_status'),
+        ('task', '0005_task_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='boss_status',
+            field=models.CharField(blank=True, editable=False, max_length=15),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='employee_sector',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='user.sector'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['boss_status', '-created_at'], name='task_active_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['employee', 'boss_status'], name='task_employee_role_idx'),
+        ),
+        migrations.RunPython(fill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.1 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.IntegerField()),
+                ('boss_id', models.IntegerField()),
+                ('employee_id', models.IntegerField()),
+                ('boss_status', models.CharField(blank=True, max_length=15)),
+                ('employee_sector_id', models.IntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['updated', 'id'], name='task_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['deleted_at', 'task_id'], name='task_tombstone_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.1 on 2026-10-18 10:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('task', '0008_task_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskupdatetimes',
+            name='fields',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='taskupdatetimes',
+            name='updated_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='updated_tasks', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.1 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    # Concurrent inserts may have created the same sector-less bucket twice: keep one with their sum.
+    TaskStat = apps.get_model('task', 'TaskStat')
+    key = ['employee', 'boss_status', 'status', 'is_changed', 'is_active']
+    duplicates = TaskStat.objects.filter(sector__isnull=True).values(*key).annotate(
+        rows=models.Count('id'), total=models.Sum('count'), keep=models.Min('id'),
+    ).filter(rows__gt=1).order_by()
+    for bucket in duplicates:
+        TaskStat.objects.filter(pk=bucket['keep']).update(count=bucket['total'])
+        TaskStat.objects.filter(sector__isnull=True, **{field: bucket[field] for field in key}).exclude(
+            pk=bucket['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0009_task_update_actor_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='taskstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('sector__isnull', True)),
+                                               fields=('employee', 'boss_status', 'status', 'is_changed',
+                                                       'is_active'),
+                                               name='task_stat_unique_key_no_sector'),
+        ),
+    ]
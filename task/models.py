@@ -1,9 +1,22 @@
 from django.db import models
 from datetime import datetime
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 
+def stored_status(user):
+    """
+    ``user.status`` as stored, for the ``boss_status`` snapshot.
+
+    A request's user built from token claims (``user.authentication.token_user``)
+    carries the role the token was issued with, which may have changed since.
+    """
+    if getattr(user, 'from_token', False):
+        return type(user)._base_manager.filter(pk=user.pk).values_list('status', flat=True).get()
+    return user.status
+
+
 class Task(models.Model):
     STATUS_CHOICES = (
         ('missed', 'Missed'),
@@ -25,10 +38,70 @@ class Task(models.Model):
     financial_help = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_changed = models.BooleanField(default=False)
+    # Snapshots of ``boss.status`` and ``employee.sector`` so role and sector
+    # filters need no join; kept in sync by ``sync_task_snapshots``.
+    boss_status = models.CharField(max_length=15, blank=True, editable=False)
+    employee_sector = models.ForeignKey('user.Sector', on_delete=models.SET_NULL, null=True, blank=True,
+                                        editable=False, related_name='+')
+
+    class Meta:
+        indexes = [
+            # Deadline sweep: status plus a deadline range.
+            models.Index(fields=['status', 'deadline'], name='task_status_deadline_idx'),
+            # Per-employee lists and counters.
+            models.Index(fields=['employee', 'status'], name='task_employee_status_idx'),
+            # Listings only ever show active tasks.
+            models.Index(fields=['boss', '-created_at'], name='task_active_boss_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['employee', 'deadline'], name='task_active_employee_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['-created_at', '-id'], name='task_active_created_idx',
+                         condition=models.Q(is_active=True)),
+            # Role-scoped listings: by issuer role, and an employee's tasks per issuer role.
+            models.Index(fields=['boss_status', '-created_at'], name='task_active_role_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['employee', 'boss_status'], name='task_employee_role_idx'),
+            # Change feed (task.feed): keyset on (updated, id).
+            models.Index(fields=['updated', 'id'], name='task_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.boss} gave a task to {self.employee}"
 
+    def save(self, *args, **kwargs):
+        stored = getattr(self, '_stored_state', None)
+        if stored is None or stored['boss_id'] != self.boss_id:
+            self.boss_status = stored_status(self.boss)
+        if stored is None or stored['employee_id'] != self.employee_id:
+            self.employee_sector_id = self.employee.sector_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_state()
+        instance.remember_values()
+        return instance
+
+    def remember_values(self):
+        # Loaded field values, for the history to list what a save changed.
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and field.attname not in AUDIT_IGNORED_FIELDS
+        }
+
+    def changed_fields(self):
+        """Fields that differ from the loaded values; ``None`` when nothing was loaded."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [name for name, value in loaded.items() if getattr(self, name) != value]
+
+    def remember_state(self):
+        # What the row looked like in the database, so the stats rollup can
+        # move the task out of its old bucket when it is saved or deleted.
+        self._stored_state = {field: getattr(self, field, None) for field in STORED_STATE_FIELDS}
+
     @property
     def all_days(self):
         days = (self.deadline.date() - self.created_at.date()).days
@@ -40,9 +113,163 @@ class Task(models.Model):
         return remain
 
 
+# Stamped on every save, not a change of its own.
+AUDIT_IGNORED_FIELDS = ('updated',)
+STORED_STATE_FIELDS = ('employee_id', 'boss_id', 'employee_sector_id', 'boss_status',
+                       'status', 'is_changed', 'is_active')
+
+
+class TaskStat(models.Model):
+    """
+    Materialized task counters, one row per
+    (sector, employee, boss role, status, is_changed, is_active).
+
+    Maintained by ``task.rollup`` from the Task signals and bulk transitions;
+    ``manage.py rebuild_task_stats`` recomputes it from scratch.
+    """
+    sector = models.ForeignKey('user.Sector', on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='task_stats')
+    employee = models.ForeignKey('user.CustomUser', on_delete=models.CASCADE, related_name='task_stats')
+    boss_status = models.CharField(max_length=15)
+    status = models.CharField(max_length=10, choices=Task.STATUS_CHOICES)
+    is_changed = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sector', 'employee', 'boss_status', 'status', 'is_changed', 'is_active'],
+                name='task_stat_unique_key',
+            ),
+            # NULLs are distinct in the key above, so sector-less buckets need their own.
+            models.UniqueConstraint(
+                fields=['employee', 'boss_status', 'status', 'is_changed', 'is_active'],
+                condition=models.Q(sector__isnull=True),
+                name='task_stat_unique_key_no_sector',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.employee} - {self.status}: {self.count}'
+
+
+@receiver(pre_save, sender=Task)
+def load_stored_state(sender, instance, **kwargs):
+    if not instance._state.adding and not hasattr(instance, '_stored_state'):
+        stored = Task.objects.filter(pk=instance.pk).values(*STORED_STATE_FIELDS).first()
+        instance._stored_state = stored
+
+
+# Connected before update_task_stats, which replaces ``_stored_state`` with the saved one.
+@receiver(post_save, sender=Task)
+def publish_task_change(sender, instance, created, **kwargs):
+    from .events import change, publish
+
+    if created:
+        return
+    stored = getattr(instance, '_stored_state', None)
+    publish([change(instance.pk, instance.boss_id, instance.employee_id, instance.status,
+                    stored['status'] if stored else None, instance.updated)])
+
+
+@receiver(post_save, sender=Task)
+def update_task_stats(sender, instance, created, **kwargs):
+    from .rollup import record_change
+
+    old = None if created else getattr(instance, '_stored_state', None)
+    with transaction.atomic():
+        record_change(old, instance)
+    instance.remember_state()
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_stats(sender, instance, origin=None, **kwargs):
+    from .rollup import record_change
+
+    if isinstance(origin, models.Model) and origin._meta.label == 'user.CustomUser' and origin.pk == instance.employee_id:
+        # Deleting the employee cascades to their rollup rows, which were deleted first.
+        return
+    old = getattr(instance, '_stored_state', None) or {
+        field: getattr(instance, field) for field in STORED_STATE_FIELDS
+    }
+    with transaction.atomic():
+        record_change(old, None)
+
+
+class TaskTombstone(models.Model):
+    """
+    A deleted task, kept for ``TASK_TOMBSTONE_DAYS`` so the change feed can report it.
+
+    Holds the ids the role scopes of ``task.feed`` filter on, as plain
+    integers: the task and its users may be gone.
+    """
+    task_id = models.IntegerField()
+    boss_id = models.IntegerField()
+    employee_id = models.IntegerField()
+    boss_status = models.CharField(max_length=15, blank=True)
+    employee_sector_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'task_id'], name='task_tombstone_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'Task {self.task_id} deleted at {self.deleted_at}'
+
+
+@receiver(post_delete, sender=Task)
+def create_tombstone(sender, instance, **kwargs):
+    TaskTombstone.objects.create(
+        task_id=instance.pk, boss_id=instance.boss_id, employee_id=instance.employee_id,
+        boss_status=instance.boss_status, employee_sector_id=instance.employee_sector_id,
+    )
+
+
+@receiver(post_save, sender='user.CustomUser')
+def sync_task_snapshots(sender, instance, created, **kwargs):
+    stored = getattr(instance, '_stored_role', None)
+    instance.remember_role()
+    if created or stored is None or stored == (instance.status, instance.sector_id):
+        return
+    from .rollup import rebuild_employees
+
+    status, sector_id = stored
+    with transaction.atomic():
+        employees = {instance.pk}
+        if status != instance.status:
+            given = Task.objects.filter(boss=instance)
+            employees.update(given.values_list('employee', flat=True).distinct())
+            given.update(boss_status=instance.status)
+        if sector_id != instance.sector_id:
+            Task.objects.filter(employee=instance).update(employee_sector=instance.sector_id)
+        rebuild_employees(employees)
+
+
+@receiver(pre_delete, sender='user.Sector')
+def load_sector_employees(sender, instance, **kwargs):
+    # The sector's rollup rows are deleted with it, while its tasks only lose their sector.
+    instance._stat_employees = set(TaskStat.objects.filter(sector=instance).values_list('employee', flat=True))
+
+
+@receiver(post_delete, sender='user.Sector')
+def rebuild_sector_stats(sender, instance, **kwargs):
+    from .rollup import rebuild_employees
+
+    employees = getattr(instance, '_stat_employees', None)
+    if employees:
+        rebuild_employees(employees)
+
+
 class TaskUpdateTimes(models.Model):
+    """One change of a task: who made it (empty for the system) and which fields it touched."""
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='updated_times')
-    updated_by = models.ForeignKey('user.CustomUser', on_delete=models.CASCADE, related_name='updated_tasks')
+    updated_by = models.ForeignKey('user.CustomUser', on_delete=models.CASCADE, related_name='updated_tasks',
+                                   null=True, blank=True)
+    # Names of the changed fields; empty when they are not known.
+    fields = models.JSONField(default=list, blank=True)
     created = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -51,12 +278,13 @@ class TaskUpdateTimes(models.Model):
 
 @receiver(post_save, sender=Task)
 def create_update_time(sender, instance, created, **kwargs):
+    from .audit import record
+
     if not created:
-        TaskUpdateTimes.objects.create(
-            task=instance, updated_by=instance.boss
-        )
-        # instance.is_changed = True
-        # instance.save()
+        fields = instance.changed_fields()
+        if fields != []:
+            record([instance.pk], fields or [])
+    instance.remember_values()
 
 
 class TaskReview(models.Model):
@@ -69,3 +297,39 @@ class TaskReview(models.Model):
 
     def __str__(self):
         return self.content[:10]
+
+
+class ReportJob(models.Model):
+    """A period report computed by a Celery worker into a compressed file under ``MEDIA_ROOT``."""
+    KIND_CHOICES = (
+        ('sector', 'Sector'),
+        ('employee', 'Employee'),
+    )
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    file_format = models.CharField(max_length=5, choices=FORMAT_CHOICES, default='csv')
+    # Parameters plus the stats version they were computed for; equal keys share one artifact.
+    key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to='reports', blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey('user.CustomUser', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='report_jobs')
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} report {self.start_date} - {self.end_date} ({self.status})'
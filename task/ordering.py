@@ -9,5 +9,5 @@ class DateRangeFilter(filters.OrderingFilter):
                 start_date = request.query_params.get('start_date')
                 end_date = request.query_params.get('end_date')
                 if start_date and end_date:
-                    queryset = queryset.filter(created__range=[start_date, end_date])
-                    return queryset
+                    queryset = queryset.filter(created_at__date__range=[start_date, end_date])
+        return queryset
@@ -0,0 +1,106 @@
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class TaskCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the task lists.
+
+    ``?ordering=`` picks one of the orderings below, each a field and ``id``.
+    Cursors hold both values of the row they continue from, so rows sharing
+    the field's value (a bulk-created deadline, a status) are paged by ``id``
+    and pages never skip or repeat a task. DRF's own cursors hold the first
+    field only and an offset into its ties, which stops advancing beyond
+    ``offset_cutoff`` tied rows. ``date_range`` (a filter, see
+    ``DateRangeFilter``) keeps the default newest-first order and any other
+    value is refused.
+    """
+    page_size = settings.TASK_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TASK_MAX_PAGE_SIZE
+    ordering = ('-created_at', '-id')
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'deadline': ('deadline', 'id'),
+        '-deadline': ('-deadline', '-id'),
+        'status': ('status', 'id'),
+        '-status': ('-status', '-id'),
+        'boss': ('boss_id', 'id'),
+        '-boss': ('-boss_id', '-id'),
+        # Read off the row as an attribute, so the name is annotated.
+        'employee__first_name': ('employee_first_name', 'id'),
+        '-employee__first_name': ('-employee_first_name', '-id'),
+    }
+    annotations = {
+        'employee_first_name': F('employee__first_name'),
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        field = self.ordering[0].lstrip('-')
+        if field in self.annotations:
+            queryset = queryset.annotate(**{field: self.annotations[field]})
+
+        # Positions are unique, so cursors never need DRF's offset.
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        current_position = self.cursor.position if self.cursor else None
+        queryset = queryset.order_by(*(self.reversed(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(self.after(current_position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = current_position is not None, current_position
+            self.has_previous, self.previous_position = has_following, following_position
+        else:
+            self.has_next, self.next_position = has_following, following_position
+            self.has_previous, self.previous_position = current_position is not None, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering')
+        if ordering is None or ordering == 'date_range':
+            return type(self).ordering
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {
+                    'status': False,
+                    'message': "Saralash maydoni noto'g'ri !"
+                }
+            )
+        return self.orderings[ordering]
+
+    @staticmethod
+    def reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
+
+    def after(self, position, reverse):
+        """Rows following ``position`` in the (possibly reversed) ordering."""
+        try:
+            value, pk = json.loads(position)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        field = self.ordering[0]
+        lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+        field = field.lstrip('-')
+        return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([str(getattr(instance, ordering[0].lstrip('-'))), instance.pk])
@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import tempfile
+
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import stats_version
+from .export import lines
+from .models import ReportJob, Task
+from .stats import COUNTERS, percentages, task_counts
+
+# How many rows are written between two progress updates.
+PROGRESS_STEP = 1000
+
+GROUPS = {
+    'sector': ('employee_sector', 'employee_sector__name'),
+    'employee': ('employee', 'employee__username'),
+}
+
+
+def report_key(kind, start_date, end_date, file_format):
+    """Deduplication key: the parameters and the version of the task data."""
+    raw = f'{kind}:{start_date}:{end_date}:{file_format}:{stats_version()}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def report_rows(job):
+    """Counters and completion rates per sector or employee for tasks created in the job's period."""
+    group, name = GROUPS[job.kind]
+    rows = Task.objects.filter(created_at__date__range=[job.start_date, job.end_date]).values(
+        group_id=F(group), name=F(name)
+    ).annotate(**task_counts()).order_by(name)
+    for row in rows:
+        row.update(percentages(row))
+        yield row
+
+
+def report_columns():
+    return ['group_id', 'name', 'total'] + list(COUNTERS) + [f'p_{key}' for key in COUNTERS]
+
+
+def generate(job):
+    job.status = 'running'
+    job.save(update_fields=['status'])
+
+    columns = report_columns()
+    rows = list(report_rows(job))
+    total = len(rows) or 1
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.open(tmp, 'wt', newline='') as out:
+            for index, line in enumerate(lines(columns, ([row[c] for c in columns] for row in rows),
+                                               job.file_format)):
+                out.write(line)
+                if index and index % PROGRESS_STEP == 0:
+                    ReportJob.objects.filter(pk=job.pk).update(progress=min(99, index * 100 // total))
+        tmp.seek(0)
+        job.file.save(f'report-{job.pk}-{job.kind}.{job.file_format}.gz', File(tmp), save=False)
+
+    job.status = 'done'
+    job.progress = 100
+    job.finished = timezone.now()
+    job.save(update_fields=['file', 'status', 'progress', 'finished'])
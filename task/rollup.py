@@ -0,0 +1,110 @@
+from collections import Counter
+
+from django.db.models import Case, Count, F, Value, When
+
+from .cache import bump_stats_version
+from .models import STORED_STATE_FIELDS, Task, TaskStat
+
+# Buckets per UPDATE statement, to stay within the SQL parameter limits.
+UPDATE_BATCH_SIZE = 500
+KEY_FIELDS = ('sector_id', 'employee_id', 'boss_status', 'status', 'is_changed', 'is_active')
+
+
+def _key(state):
+    return (state['employee_sector_id'], state['employee_id'], state['boss_status'],
+            state['status'], state['is_changed'], state['is_active'])
+
+
+def _state(task):
+    return {field: getattr(task, field) for field in STORED_STATE_FIELDS}
+
+
+def record_change(old, task):
+    """
+    Move one task between rollup buckets.
+
+    ``old`` is the stored state the task had before the change (``None`` for a
+    new task) and ``task`` the saved instance (``None`` once it is deleted).
+    """
+    new = None if task is None else _state(task)
+    if old == new:
+        return
+    deltas = Counter()
+    if old:
+        deltas[_key(old)] -= 1
+    if new:
+        deltas[_key(new)] += 1
+    apply_deltas(deltas)
+
+
+def record_created(tasks):
+    """Rollup side of ``bulk_create(tasks)``."""
+    apply_deltas(Counter(_key(_state(task)) for task in tasks))
+
+
+def record_bulk_change(states, **changes):
+    """Rollup side of ``update(**changes)`` on tasks whose stored states are ``states``."""
+    deltas = Counter()
+    for old in states:
+        deltas[_key(old)] -= 1
+        deltas[_key({**old, **changes})] += 1
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """Add ``{key: delta}`` to the rollup; call inside the transaction that changed the tasks."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    bump_stats_version()
+    # A fixed number of queries however many buckets change, so bulk transitions stay O(1).
+    buckets = _buckets(deltas)
+    # Only additions need a bucket: a missing one to subtract from was deleted (with its employee
+    # or sector) or never counted the task, and inserting it could reference a row being deleted.
+    missing = [key for key in deltas if key not in buckets and deltas[key] > 0]
+    if missing:
+        # Conflicts are buckets another transaction has just created.
+        TaskStat.objects.bulk_create([TaskStat(**dict(zip(KEY_FIELDS, key))) for key in missing],
+                                     ignore_conflicts=True)
+        buckets = _buckets(deltas)
+    items = list(buckets.items())
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = items[start:start + UPDATE_BATCH_SIZE]
+        TaskStat.objects.filter(pk__in=[pk for _, pk in batch]).update(
+            count=F('count') + Case(*[When(pk=pk, then=Value(deltas[key])) for key, pk in batch])
+        )
+
+
+def _buckets(keys):
+    """``{key: pk}`` of the rollup rows of ``keys`` that exist."""
+    rows = TaskStat.objects.filter(employee__in={key[1] for key in keys}).values_list(*KEY_FIELDS, 'pk')
+    return {tuple(row[:-1]): row[-1] for row in rows if tuple(row[:-1]) in keys}
+
+
+def actual_counts(tasks=None):
+    """``{key: count}`` computed from the ``task_task`` table itself."""
+    if tasks is None:
+        tasks = Task.objects.all()
+    rows = tasks.values_list(
+        'employee_sector', 'employee', 'boss_status', 'status', 'is_changed', 'is_active',
+    ).annotate(count=Count('id')).order_by()
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def stored_counts():
+    """``{key: count}`` as currently held by the rollup, ignoring empty buckets."""
+    rows = TaskStat.objects.exclude(count=0).values_list(*KEY_FIELDS, 'count')
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def create_stats(counts):
+    bump_stats_version()
+    TaskStat.objects.bulk_create(
+        TaskStat(count=count, **dict(zip(KEY_FIELDS, key))) for key, count in counts.items()
+    )
+
+
+def rebuild_employees(employee_ids):
+    """Recount the rollup rows of ``employee_ids`` from their tasks."""
+    TaskStat.objects.filter(employee__in=employee_ids).delete()
+    create_stats(actual_counts(Task.objects.filter(employee__in=employee_ids)))
@@ -0,0 +1,35 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+
+def day_start(day):
+    """Aware local midnight of ``day``; compare ``deadline`` to it instead of ``deadline__date``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def missed_at(deadline):
+    """Start of the local day after ``deadline``, when a task still doing becomes missed."""
+    return day_start(timezone.localtime(deadline).date() + timedelta(days=1))
+
+
+def schedule_deadline(task):
+    """
+    Enqueue the deadline transition of ``task`` once the transaction commits.
+
+    Call it whenever a task is created or its deadline changes. Jobs carry the
+    deadline they were scheduled for and ``apply_deadline`` ignores them when
+    it has changed since, so stale jobs need no revoking. A missed task whose
+    deadline was moved forward is reopened right away.
+    """
+    from .tasks import apply_deadline
+
+    args = (task.pk, task.deadline.isoformat())
+
+    def enqueue():
+        if task.status == 'missed':
+            apply_deadline.delay(*args)
+        apply_deadline.apply_async(args, eta=missed_at(task.deadline))
+
+    transaction.on_commit(enqueue)
@@ -1,9 +1,22 @@
-from .models import Task, TaskReview
+from .models import ReportJob, Task, TaskReview, stored_status
+from .rollup import record_created
+from .scheduler import schedule_deadline
+from user.models import CustomUser
 from datetime import date
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+# Upper bound on the items of one bulk request.
+BULK_LIMIT = 500
+
+NOT_IN_SECTOR = 'Bunday xodim sizning bo\'limingizda mavjud emas!'
+
+
+def can_assign(boss, employee):
+    """Managers may only give tasks to employees of their own sector."""
+    return not (boss.status == 'manager' and employee.sector_id != boss.sector_id)
+
 
 class TaskSerializer(serializers.ModelSerializer):
     boss = serializers.ReadOnlyField(source='boss.username')
@@ -19,13 +32,18 @@ class TaskSerializer(serializers.ModelSerializer):
                   ]
         read_only_fields = ('status', 'created_at', 'updated', 'financial_help')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Relations read by the fields above.
+        return queryset.select_related('boss')
+
     def validate_employee(self, value):
         boss = self.context['request'].user
-        if boss and boss.status == 'manager' and value and value.sector != boss.sector:
+        if boss and value and not can_assign(boss, value):
             raise ValidationError(
                 {
                     'status': False,
-                    'message': 'Bunday xodim sizning bo\'limingizda mavjud emas!'
+                    'message': NOT_IN_SECTOR
                 }
             )
         return value
@@ -46,10 +64,66 @@ class TaskSerializer(serializers.ModelSerializer):
         return obj.all_days
 
 
+class BulkTaskCreateSerializer(TaskSerializer):
+    """
+    The same task for every employee in ``employees``.
+
+    Employees are looked up with one query; unknown ones and ones outside a
+    manager's sector are reported per item instead of failing the batch.
+    """
+    employees = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=BULK_LIMIT)
+
+    class Meta(TaskSerializer.Meta):
+        fields = ['problem', 'reason', 'event', 'deadline', 'employees']
+
+    def validate_employees(self, value):
+        found = CustomUser.objects.in_bulk(set(value))
+        return [(pk, found.get(pk)) for pk in dict.fromkeys(value)]
+
+    def create(self, validated_data):
+        boss = self.context['request'].user
+        boss_status = stored_status(boss)
+        results = []
+        tasks = []
+        for pk, employee in validated_data.pop('employees'):
+            if employee is None:
+                results.append({'employee': pk, 'status': False, 'message': 'Bunday xodim mavjud emas!'})
+            elif not can_assign(boss, employee):
+                results.append({'employee': pk, 'status': False, 'message': NOT_IN_SECTOR})
+            else:
+                task = Task(boss=boss, employee=employee, boss_status=boss_status,
+                            employee_sector_id=employee.sector_id, **validated_data)
+                tasks.append(task)
+                results.append({'employee': pk, 'status': True, 'task': task})
+
+        Task.objects.bulk_create(tasks)
+        record_created(tasks)
+        for task in tasks:
+            task.remember_state()
+            schedule_deadline(task)
+        for result in results:
+            if 'task' in result:
+                result['id'] = result.pop('task').pk
+        return results
+
+
+class BulkTaskIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=BULK_LIMIT)
+
+
 class TaskReviewSerializer(serializers.ModelSerializer):
+    user = serializers.ReadOnlyField(source='user.username')
+
     class Meta:
         model = TaskReview
-        fields = ['content']
+        fields = ['id', 'user', 'content', 'reply', 'created']
+        # Shown, not set: any review id would be accepted, even one of another task.
+        read_only_fields = ('reply', 'created')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Relations read by the fields above.
+        return queryset.select_related('user')
 
     def validate(self, attrs):
         content = attrs.get('content', None)
@@ -62,3 +136,29 @@ class TaskReviewSerializer(serializers.ModelSerializer):
             )
         else:
             return attrs
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'start_date', 'end_date', 'file_format',
+                  'status', 'progress', 'download', 'error', 'created', 'finished']
+        read_only_fields = ('status', 'progress', 'error', 'created', 'finished')
+
+    def validate(self, attrs):
+        if attrs['start_date'] > attrs['end_date']:
+            raise ValidationError(
+                {
+                    'status': False,
+                    'message': 'Boshlanish sanasi tugash sanasidan oldin bo\'lishi kerak!'
+                }
+            )
+        return attrs
+
+    def get_download(self, obj):
+        if obj.status != 'done' or not obj.file:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(obj.file.url) if request else obj.file.url
@@ -0,0 +1,90 @@
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import TaskStat
+
+STATUSES = ('doing', 'finished', 'canceled', 'missed')
+COUNTERS = STATUSES + ('changed',)
+
+# Tasks counted on the dashboard: active ones given by the director (or admin).
+DIRECTOR_TASKS = Q(boss_status__in=('director', 'admin')) & Q(is_active=True)
+
+
+def task_counts(prefix=''):
+    """
+    Conditional aggregates for the task counters used by every stats payload.
+
+    ``prefix`` is the lookup path from the aggregated model to ``Task``,
+    e.g. ``'accepted_tasks__'`` when annotating users.
+    """
+    counts = {'total': Count(f'{prefix}id')}
+    for status in STATUSES:
+        counts[status] = Count(f'{prefix}id', filter=Q(**{f'{prefix}status': status}))
+    counts['changed'] = Count(f'{prefix}id', filter=Q(**{f'{prefix}is_changed': True}))
+    return counts
+
+
+def stat_counts(prefix=''):
+    """
+    The same counters as ``task_counts``, summed from the ``TaskStat`` rollup.
+
+    ``prefix`` is the lookup path from the aggregated model to ``TaskStat``.
+    """
+    def sum_count(**lookups):
+        condition = Q(**{f'{prefix}{field}': value for field, value in lookups.items()}) if lookups else None
+        return Coalesce(Sum(f'{prefix}count', filter=condition), 0)
+
+    counts = {'total': sum_count()}
+    for status in STATUSES:
+        counts[status] = sum_count(status=status)
+    counts['changed'] = sum_count(is_changed=True)
+    return counts
+
+
+def with_task_stats(users):
+    """Annotate a ``CustomUser`` queryset with the counters of its accepted tasks."""
+    return users.annotate(**stat_counts('task_stats__'))
+
+
+def user_task_stats(user):
+    """Counters of a single user's accepted tasks, in one query."""
+    return user.task_stats.aggregate(**stat_counts())
+
+
+def percent(part, total):
+    if total and part is not None:
+        return part * 100.0 / total
+    return 0
+
+
+def percentages(counts):
+    """``p_<counter>`` share of every counter in ``counts``."""
+    return {f'p_{key}': percent(counts[key], counts['total']) for key in COUNTERS}
+
+
+def director_task_stats():
+    return TaskStat.objects.filter(DIRECTOR_TASKS).aggregate(**stat_counts())
+
+
+async def adirector_task_stats():
+    return await TaskStat.objects.filter(DIRECTOR_TASKS).aaggregate(**stat_counts())
+
+
+def sector_stat_rows(sectors=None):
+    stats = TaskStat.objects.filter(DIRECTOR_TASKS)
+    if sectors is not None:
+        stats = stats.filter(sector__in=sectors)
+    return stats.values('sector').annotate(**stat_counts()).order_by()
+
+
+def sector_task_stats(sectors=None):
+    """
+    Counters of director tasks per sector, keyed by sector id.
+
+    One ``GROUP BY sector`` query over the rollup; sectors without tasks are absent.
+    """
+    return {row.pop('sector'): row for row in sector_stat_rows(sectors) if row['total']}
+
+
+async def asector_task_stats(sectors=None):
+    return {row.pop('sector'): row async for row in sector_stat_rows(sectors) if row['total']}
@@ -1,18 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
 from django.db.models import Q
-from datetime import datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from config.celery import app
-from task.models import Task
+from task.locks import cache_lock
+from task.models import ReportJob, Task, TaskTombstone
+from task.reports import generate
+from task.scheduler import day_start
+from task.transitions import bulk_transition
+
+MISSED_SWEEP_LOCK = 'task:update_task_missed:lock'
+# Longer than any sweep should take, so a killed worker cannot hold the lock for good.
+MISSED_SWEEP_LOCK_TIMEOUT = 60 * 10
+
+
+def sync_deadlines(tasks):
+    """Mark overdue tasks missed and reopen missed ones whose deadline moved forward."""
+    # Plain ranges on ``deadline`` (not ``deadline__date``) so task_status_deadline_idx applies.
+    today = timezone.localdate()
+    changed = bulk_transition(tasks.filter(Q(deadline__lt=day_start(today)) & Q(status='doing')), 'missed')
+    changed += bulk_transition(
+        tasks.filter(Q(deadline__gte=day_start(today + timedelta(days=1))) & Q(status='missed')), 'doing'
+    )
+    return len(changed)
+
+
+@app.task()
+def apply_deadline(task_id, deadline):
+    # Scheduled by task.scheduler; a job for a deadline that has since changed matches nothing.
+    return sync_deadlines(Task.objects.filter(pk=task_id, deadline=parse_datetime(deadline)))
 
 
 @app.task()
 def update_task_missed():
-    tasks = Task.objects.filter(Q(deadline__date__lt=datetime.now().date()) & Q(status='doing'))
-    if tasks:
-        for task in tasks:
-            task.status = 'missed'
-            task.save()
-    tasks = Task.objects.filter(Q(deadline__date__gt=datetime.now().date()) & Q(status='missed'))
-    if tasks:
-        for t in tasks:
-            t.status = 'doing'
-            t.save()
+    # Reconciliation sweep behind the per-task deadline jobs.
+    # Overlapping beat ticks skip instead of sweeping the same rows twice.
+    with cache_lock(MISSED_SWEEP_LOCK, MISSED_SWEEP_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return 0
+        return sync_deadlines(Task.objects.all())
+
+
+@app.task()
+def generate_report(job_id):
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        generate(job)
+    except Exception as exc:
+        # The error may have broken the connection; reconnect rather than fail the update too.
+        if not connection.in_atomic_block:
+            close_old_connections()
+        ReportJob.objects.filter(pk=job_id).update(status='failed', error=str(exc), finished=timezone.now())
+        raise
+
+
+@app.task()
+def purge_task_tombstones():
+    # Cursors older than this are refused by the change feed anyway.
+    cutoff = timezone.now() - timedelta(days=settings.TASK_TOMBSTONE_DAYS)
+    return TaskTombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
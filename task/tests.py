@@ -1,3 +1,978 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+from contextlib import ExitStack
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import django
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import async_to_sync
+from redis.exceptions import LockNotOwnedError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.authentication import set_role_claims
+from user.models import CustomUser, Sector
+from user.views import ManagerStatListView, UserStatListView
+from . import events, locks
+from .audit import _pending, _scope
+from .feed import encode_cursor
+from .locks import REDIS_CACHE, break_lock, cache_lock
+from .models import ReportJob, Task, TaskReview, TaskStat, TaskUpdateTimes
+from .serializers import NOT_IN_SECTOR
+from .rollup import actual_counts, stored_counts
+from .scheduler import day_start, missed_at
+from .tasks import (MISSED_SWEEP_LOCK, MISSED_SWEEP_LOCK_TIMEOUT, apply_deadline, generate_report,
+                    update_task_missed)
+from .views import SectorStatView, StatView
+
+
+class TaskIndexTest(TestCase):
+    """The hot task queries must be answered from the indexes declared on ``Task``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = CustomUser.objects.create(username='boss', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, make the planner show what it would do with real data.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn(index_name, queryset.explain())
+
+    def test_deadline_sweep(self):
+        tasks = Task.objects.filter(deadline__lt=day_start(timezone.localdate()), status='doing')
+        self.assertUsesIndex(tasks, 'task_status_deadline_idx')
+
+    def test_employee_counters(self):
+        tasks = Task.objects.filter(employee=self.employee, status='finished')
+        self.assertUsesIndex(tasks, 'task_employee_status_idx')
+
+    def test_boss_listing(self):
+        tasks = Task.objects.filter(boss=self.boss, is_active=True).order_by('-created_at')
+        self.assertUsesIndex(tasks, 'task_active_boss_idx')
+
+    def test_employee_listing(self):
+        tasks = Task.objects.filter(
+            employee=self.employee, is_active=True, deadline__gte=timezone.now() - timedelta(days=30)
+        )
+        self.assertUsesIndex(tasks, 'task_active_employee_idx')
+
+    def test_active_listing(self):
+        tasks = Task.objects.filter(is_active=True).order_by('-created_at', '-id')
+        self.assertUsesIndex(tasks, 'task_active_created_idx')
+
+    def test_role_listing(self):
+        tasks = Task.objects.filter(is_active=True, boss_status__in=['director', 'admin']).order_by('-created_at')
+        self.assertUsesIndex(tasks, 'task_active_role_idx')
+
+    def test_employee_role_listing(self):
+        tasks = Task.objects.filter(employee=self.employee, boss_status='manager')
+        self.assertUsesIndex(tasks, 'task_employee_role_idx')
+
+
+class TaskListQueryCountTest(TestCase):
+    """Listing tasks and reviews costs the same number of queries for any number of rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.director, employee=cls.employee)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def add_rows(self, count):
+        # Every row gets its own boss/author so a per-row lookup would show up.
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'user{CustomUser.objects.count()}-{i}', status='admin') for i in range(count)
+        )
+        Task.objects.bulk_create(
+            Task(problem='p', deadline=timezone.now() + timedelta(days=3), boss=user, boss_status=user.status,
+                 employee=self.employee)
+            for user in users
+        )
+        TaskReview.objects.bulk_create(TaskReview(task=self.task, user=user, content='c') for user in users)
+
+    def assertConstantQueries(self, url, num):
+        for rows in (10, 200):
+            self.add_rows(rows)
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_director_tasks(self):
+        self.assertConstantQueries(reverse('director_tasks') + '?page_size=500', 2)
+
+    def test_user_director_tasks(self):
+        self.assertConstantQueries(
+            reverse('user_director_tasks', args=[self.employee.id]) + '?page_size=500', 3
+        )
+
+    def test_task_reviews(self):
+        self.assertConstantQueries(reverse('task_reviews', args=[self.task.id]), 2)
+
+    def test_reviews_for_task(self):
+        self.assertConstantQueries(reverse('reviews_for_task', args=[self.task.id]), 1)
+
+
+class TaskOrderingTest(TestCase):
+    """Every ``?ordering=`` pages through all tasks once; unknown ones are refused."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create(username='manager', status='manager')
+        cls.other = CustomUser.objects.create(username='other', status='manager')
+        employees = [CustomUser.objects.create(username=f'employee{i}', first_name=name)
+                     for i, name in enumerate(['Bobur', 'Aziz', 'Bobur'])]
+        for i, status in enumerate(['doing', 'finished', 'doing', 'missed', 'canceled']):
+            Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3 + i % 2), status=status,
+                                boss=cls.manager if i % 2 else cls.other, employee=employees[i % 3])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def pages(self, url, ordering, page_size=2):
+        ids = []
+        response = self.client.get(url, {'ordering': ordering, 'page_size': page_size})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [task['id'] for task in response.json()['results']]
+            if not response.json()['next']:
+                return ids
+            self.assertLessEqual(len(ids), Task.objects.count())
+            response = self.client.get(response.json()['next'])
+
+    def test_orderings(self):
+        tasks = Task.objects.select_related('employee')
+        keys = {
+            'status': lambda task: (task.status, task.id),
+            'boss': lambda task: (task.boss_id, task.id),
+            'employee__first_name': lambda task: (task.employee.first_name, task.id),
+        }
+        for field, key in keys.items():
+            expected = [task.id for task in sorted(tasks, key=key)]
+            self.assertEqual(self.pages(reverse('tasks_create'), field), expected)
+            self.assertEqual(self.pages(reverse('tasks_create'), '-' + field), expected[::-1])
+
+    def test_ties(self):
+        # More rows sharing a deadline than DRF's offset_cutoff of 1000.
+        deadline = timezone.now() + timedelta(days=7)
+        Task.objects.bulk_create(
+            Task(problem='p', deadline=deadline, boss=self.manager, boss_status='manager', employee=self.other)
+            for _ in range(1100)
+        )
+        expected = list(Task.objects.order_by('deadline', 'id').values_list('id', flat=True))
+        self.assertEqual(self.pages(reverse('tasks_create'), 'deadline', page_size=100), expected)
+
+    def test_previous(self):
+        first = self.client.get(reverse('tasks_create'), {'ordering': 'status', 'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_unknown_ordering(self):
+        for ordering in ('problem', 'status,id', '-date_range'):
+            response = self.client.get(reverse('tasks_create'), {'ordering': ordering})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], "Saralash maydoni noto'g'ri !")
+
+    def test_manager_search(self):
+        response = self.client.get(reverse('manager_tasks'), {'search': 'aziz'})
+        self.assertEqual([task['id'] for task in response.json()['results']],
+                         list(Task.objects.filter(boss=self.manager, employee__first_name='Aziz')
+                              .order_by('-created_at', '-id').values_list('id', flat=True)))
+
+
+class TaskRollupTest(TestCase):
+    """Deletes keep the TaskStat rollup equal to a recount; rebuild_task_stats repairs drift."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.boss = CustomUser.objects.create(username='boss', status='manager', sector=cls.sector)
+        cls.employee = CustomUser.objects.create(username='employee', sector=cls.sector)
+        cls.other = CustomUser.objects.create(username='other', sector=cls.sector)
+        deadline = timezone.now() + timedelta(days=3)
+        cls.tasks = [Task.objects.create(problem='p', deadline=deadline, boss=cls.boss, employee=employee)
+                     for employee in (cls.employee, cls.employee, cls.other)]
+
+    def assertConsistent(self):
+        connection.check_constraints()
+        self.assertEqual(stored_counts(), actual_counts())
+
+    def test_task_delete(self):
+        self.tasks[0].delete()
+        self.assertConsistent()
+        self.assertEqual(sum(stored_counts().values()), 2)
+
+    def test_employee_delete(self):
+        self.employee.delete()
+        self.assertConsistent()
+        self.assertEqual(sum(stored_counts().values()), 1)
+
+    def test_boss_delete(self):
+        self.boss.delete()
+        self.assertConsistent()
+        self.assertEqual(stored_counts(), {})
+
+    def test_one_bucket_without_sector(self):
+        key = {'sector': None, 'employee': self.other, 'boss_status': 'manager', 'status': 'doing'}
+        TaskStat.objects.bulk_create([TaskStat(**key), TaskStat(**key)], ignore_conflicts=True)
+        self.assertEqual(TaskStat.objects.filter(**key).count(), 1)
+
+    def drift(self):
+        Task.objects.filter(pk=self.tasks[0].pk).update(status='finished')
+
+    def test_rebuild_check(self):
+        self.drift()
+        before = stored_counts()
+        out = StringIO()
+        call_command('rebuild_task_stats', check=True, stdout=out)
+        self.assertIn('2 drifted bucket(s).', out.getvalue())
+        self.assertEqual(stored_counts(), before)
+
+    def test_rebuild(self):
+        self.drift()
+        out = StringIO()
+        call_command('rebuild_task_stats', stdout=out)
+        self.assertIn('2 had drifted', out.getvalue())
+        self.assertConsistent()
+
+
+class TaskConditionalTest(TestCase):
+    """Task ETags change with everything the response shows: the task, the date and the boss's name."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.director, employee=cls.employee)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def urls(self):
+        return reverse('task_detail', args=[self.task.id]), reverse('director_tasks')
+
+    def etags(self):
+        etags = []
+        for url in self.urls():
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            etags.append(response['ETag'])
+        return etags
+
+    def test_boss_renamed(self):
+        etags = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.director.username = 'renamed'
+            self.director.save()
+        for url, etag in zip(self.urls(), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('renamed', response.content.decode())
+
+    def test_next_day(self):
+        etags = self.etags()
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('task.views.timezone.localdate', return_value=tomorrow):
+            for url, etag in zip(self.urls(), etags):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StatsInvalidationTest(TestCase):
+    """A committed task or user change makes cached stats and their ETags stale."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee', first_name='ali', sector=cls.sector)
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.director, employee=cls.employee)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def cached(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def fresh(self, name, etag):
+        response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response.json()
+
+    def test_task_change(self):
+        etag = self.cached('tasks_stats')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = 'finished'
+            self.task.save()
+        stats = self.fresh('tasks_stats', etag)
+        self.assertEqual((stats['doing'], stats['finished']), (0, 1))
+
+    def test_task_create(self):
+        etag = self.cached('stats')
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                boss=self.director, employee=self.employee)
+        self.assertEqual(self.fresh('stats', etag)[0]['total'], 2)
+
+    def test_user_change(self):
+        etags = [self.cached('stats'), self.cached('director_tasks')]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.first_name = 'vali'
+            self.employee.save()
+        self.assertEqual(self.fresh('stats', etags[0])[0]['first_name'], 'vali')
+        self.fresh('director_tasks', etags[1])
+
+    def test_user_delete(self):
+        etag = self.cached('stats')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.delete()
+        self.assertEqual(self.fresh('stats', etag), [])
+
+    def test_uncommitted_change(self):
+        # Bumps wait for the commit, so a rolled back change keeps the cached stats.
+        etag = self.cached('tasks_stats')
+        with self.captureOnCommitCallbacks(execute=False):
+            self.task.status = 'finished'
+            self.task.save()
+        self.assertEqual(self.client.get(reverse('tasks_stats'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class AsyncStatViewTest(TestCase):
+    """The dashboard stats views run on the event loop with the async ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee', status='employee', sector=cls.sector)
+        Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                            boss=cls.director, employee=cls.employee)
+
+    def setUp(self):
+        # Stats responses are cached until a commit bumps the version, which never happens in a TestCase.
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def test_handlers_are_async(self):
+        for view in (StatView, SectorStatView, UserStatListView, ManagerStatListView):
+            self.assertTrue(view.view_is_async, view)
+
+    def test_stats(self):
+        response = self.client.get(reverse('tasks_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['doing'], 1)
+        response = self.client.get(reverse('tasks_stats'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sector_stats(self):
+        response = self.client.get(reverse('sectors_stats'))
+        self.assertEqual(response.json()['message'][0]['sector'], 'A')
+        response = self.client.get(reverse('sector_employee_stat', args=[self.sector.id]))
+        self.assertEqual(response.json()[0]['total'], 1)
+
+    def test_sector_delete(self):
+        self.sector.delete()
+        self.assertEqual(stored_counts(), actual_counts())
+        self.assertEqual(self.client.get(reverse('tasks_stats')).json()['doing'], 1)
+
+    def test_invalid_token(self):
+        response = APIClient().get(reverse('stats'), HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+
+@override_settings(TASK_FEED_SETTLE_SECONDS=0)
+class TaskFeedTest(TestCase):
+    """The change feed returns what changed after a cursor, within the user's scope."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.manager = CustomUser.objects.create(username='manager', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.other = CustomUser.objects.create(username='other')
+        deadline = timezone.now() + timedelta(days=3)
+        cls.own = Task.objects.create(problem='own', deadline=deadline, boss=cls.manager, employee=cls.employee)
+        cls.foreign = Task.objects.create(problem='foreign', deadline=deadline, boss=cls.director,
+                                          employee=cls.other)
+
+    def changes(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse('task_changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, data):
+        return [task['id'] for task in data['results']]
+
+    def test_scopes(self):
+        self.assertEqual(self.ids(self.changes(self.director)), [self.own.id, self.foreign.id])
+        self.assertEqual(self.ids(self.changes(self.manager)), [self.own.id])
+        self.assertEqual(self.ids(self.changes(self.employee)), [self.own.id])
+        self.assertEqual(self.ids(self.changes(self.other)), [self.foreign.id])
+
+    def test_poll(self):
+        since = self.changes(self.employee)['since']
+        self.assertEqual(self.changes(self.employee, since=since)['results'], [])
+        self.own.problem = 'changed'
+        self.own.save()
+        data = self.changes(self.employee, since=since)
+        self.assertEqual(data['results'][0]['problem'], 'changed')
+        self.assertEqual(self.changes(self.employee, since=data['since'])['results'], [])
+
+    def test_tombstones(self):
+        since = self.changes(self.director)['since']
+        self.own.is_active = False
+        self.own.save()
+        foreign_id = self.foreign.id
+        self.foreign.delete()
+        data = self.changes(self.director, since=since)
+        self.assertEqual(data['results'], [])
+        self.assertEqual([(t['id'], t['reason']) for t in data['tombstones']],
+                         [(self.own.id, 'deactivated'), (foreign_id, 'deleted')])
+        # Other users' deletions stay out of the feed.
+        self.assertEqual([t['id'] for t in self.changes(self.employee, since=since)['tombstones']], [self.own.id])
+
+    def test_pages(self):
+        data = self.changes(self.director, page_size=1)
+        self.assertEqual((self.ids(data), data['has_more']), ([self.own.id], True))
+        data = self.changes(self.director, page_size=1, since=data['since'])
+        self.assertEqual((self.ids(data), data['has_more']), ([self.foreign.id], False))
+
+    def test_bad_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        self.assertEqual(client.get(reverse('task_changes'), {'since': 'x'}).status_code, 400)
+        old = encode_cursor(timezone.now() - timedelta(days=365), 0)
+        response = client.get(reverse('task_changes'), {'since': old})
+        self.assertEqual(response.status_code, 400)
+        self.assertIs(response.json()['reset'], True)
+
+    def test_old_changes_keep_the_cursor_fresh(self):
+        Task.objects.filter(pk=self.own.pk).update(updated=timezone.now() - timedelta(days=40))
+        data = self.changes(self.employee)
+        self.assertEqual(self.ids(data), [self.own.id])
+        for _ in range(2):
+            data = self.changes(self.employee, since=data['since'])
+            self.assertEqual(data['results'], [])
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    async def subscribe(self, channel):
+        self.channel = channel
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        if self.messages:
+            return {'data': self.messages.pop(0)}
+        await asyncio.sleep(timeout)
+
+    async def close(self):
+        pass
+
+
+class TaskEventsTest(TestCase):
+    """Task changes are published on commit and streamed to the users who see them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.other = CustomUser.objects.create(username='other')
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.director, employee=cls.employee)
+
+    def published(self, action):
+        with mock.patch.object(events, 'send') as send, self.captureOnCommitCallbacks(execute=True):
+            action()
+        return [change for call in send.call_args_list for change in json.loads(call.args[0])]
+
+    def test_finish(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        changes = self.published(lambda: client.patch(reverse('finished', args=[self.task.id])))
+        self.assertEqual([(c['id'], c['previous_status'], c['status']) for c in changes],
+                         [(self.task.id, 'doing', 'finished')])
+
+    def test_missed_sweep(self):
+        Task.objects.filter(pk=self.task.pk).update(deadline=timezone.now() - timedelta(days=3))
+        changes = self.published(update_task_missed)
+        self.assertEqual([(c['previous_status'], c['status']) for c in changes], [('doing', 'missed')])
+
+    def test_rollback(self):
+        def finish_and_roll_back():
+            with transaction.atomic():
+                self.task.status = 'finished'
+                self.task.save()
+                transaction.set_rollback(True)
+        self.assertEqual(self.published(finish_and_roll_back), [])
+
+    @override_settings(TASK_EVENTS_MAX_AGE=0.05, TASK_EVENTS_HEARTBEAT=0.01)
+    def test_stream(self):
+        change = events.change(self.task.id, self.director.id, self.employee.id, 'finished', 'doing',
+                               timezone.now())
+        payload = json.dumps([change], cls=events.DjangoJSONEncoder)
+
+        async def read(user, last_event_id=None):
+            return [chunk async for chunk in events.stream(user, last_event_id)]
+
+        with mock.patch('redis.asyncio.Redis.from_url') as from_url:
+            from_url.return_value.close = mock.AsyncMock()
+            from_url.return_value.pubsub.side_effect = lambda: FakePubSub([payload])
+            seen = async_to_sync(read)(self.employee, 'last')
+            unseen = async_to_sync(read)(self.other)
+        self.assertIn('event: resync', seen[1])
+        self.assertIn(f'id: {change["cursor"]}\nevent: task', seen[2])
+        self.assertFalse(any('event: task' in chunk for chunk in unseen))
+        self.assertIn(': ping\n\n', unseen)
+
+    def test_needs_asgi(self):
+        client = APIClient()
+        client.force_authenticate(self.director)
+        self.assertEqual(client.get(reverse('task_events')).status_code, 400)
+
+    @override_settings(TASK_EVENTS_REDIS_URL='redis://localhost:6379/1', TASK_EVENTS_REDIS_TIMEOUT=0.2)
+    def test_publish_timeout(self):
+        with mock.patch.object(events, '_client', None), mock.patch('redis.Redis.from_url') as from_url:
+            events.client()
+        from_url.assert_called_once_with('redis://localhost:6379/1', socket_connect_timeout=0.2, socket_timeout=0.2)
+
+
+@override_settings(TASK_EVENTS_REDIS_URL='')
+class TaskAuditTest(TestCase):
+    """The task history is written in one batch per transaction, with the real actor and fields."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = CustomUser.objects.create(username='boss', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.boss, employee=cls.employee)
+
+    def history(self):
+        return list(TaskUpdateTimes.objects.values_list('updated_by', 'fields'))
+
+    def test_actor(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(reverse('finished', args=[self.task.id]))
+        self.assertEqual(self.history(), [(self.employee.id, ['status'])])
+
+    def test_one_insert_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            task = Task.objects.get(pk=self.task.pk)
+            task.problem = 'changed'
+            task.save()
+            task.status = 'finished'
+            task.save()
+            # Saves without changes leave no row.
+            task.save()
+        self.assertEqual(self.history(), [])
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.history(), [(None, ['problem']), (None, ['status'])])
+
+    def test_savepoint_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.task.status = 'finished'
+            self.task.save()
+            with transaction.atomic():
+                self.task.status = 'canceled'
+                self.task.save()
+                transaction.set_rollback(True)
+        self.assertEqual(self.history(), [(None, ['status'])])
+
+    def test_batches_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.task.status = 'finished'
+            self.task.save()
+            with transaction.atomic():
+                self.task.status = 'canceled'
+                self.task.save()
+                transaction.set_rollback(True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.problem = 'changed'
+            self.task.save()
+        self.assertEqual(transaction.get_connection().__dict__['task_audit_batches'], {})
+
+    def test_django_internals(self):
+        # record() reads these private connection attributes, see task/audit.py.
+        self.assertEqual(django.VERSION[:2], (4, 2))
+        connection = transaction.get_connection()
+        callback = mock.Mock()
+        with transaction.atomic():
+            outer = _scope(connection)
+            with transaction.atomic():
+                self.assertEqual(_scope(connection)[:-1], outer)
+                self.assertNotEqual(_scope(connection), outer)
+                transaction.on_commit(callback)
+                self.assertIn(id(callback), _pending(connection))
+                transaction.set_rollback(True)
+            self.assertEqual(_scope(connection), outer)
+            self.assertNotIn(id(callback), _pending(connection))
+
+    def test_sweep_has_no_actor(self):
+        Task.objects.filter(pk=self.task.pk).update(deadline=timezone.now() - timedelta(days=3))
+        with self.captureOnCommitCallbacks(execute=True):
+            update_task_missed()
+        self.assertEqual(self.history(), [(None, ['status'])])
+
+
+class BulkStatusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = CustomUser.objects.create(username='boss', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+        cls.task = Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=3),
+                                       boss=cls.boss, employee=cls.employee)
+
+    def test_anonymous(self):
+        for name in ('tasks_bulk_finish', 'tasks_bulk_cancel'):
+            response = APIClient().post(reverse(name), {'ids': [self.task.id]}, format='json')
+            self.assertEqual(response.status_code, 401)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'doing')
+
+    def test_finish(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        response = client.post(reverse('tasks_bulk_finish'), {'ids': [self.task.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'finished')
+
+
+class BulkTaskCreateTest(TestCase):
+    """One task per valid employee, with snapshots, rollup and deadline jobs; bad rows reported per item."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.manager = CustomUser.objects.create(username='manager', status='manager', sector=cls.sector)
+        cls.own = CustomUser.objects.create(username='own', sector=cls.sector)
+        cls.foreign = CustomUser.objects.create(username='foreign', sector=Sector.objects.create(name='B'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.deadline = timezone.now() + timedelta(days=3)
+
+    def post(self, employees, deadline=None):
+        data = {'problem': 'p', 'deadline': (deadline or self.deadline).isoformat(), 'employees': employees}
+        return self.client.post(reverse('tasks_bulk_create'), data, format='json')
+
+    def test_create(self):
+        with mock.patch('task.tasks.apply_deadline.apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.post([self.own.id, self.foreign.id, 0, self.own.id])
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get()
+        self.assertEqual(response.json()['results'], [
+            {'employee': self.own.id, 'status': True, 'id': task.id},
+            {'employee': self.foreign.id, 'status': False, 'message': NOT_IN_SECTOR},
+            {'employee': 0, 'status': False, 'message': 'Bunday xodim mavjud emas!'},
+        ])
+        self.assertEqual((task.boss, task.employee, task.boss_status, task.employee_sector),
+                         (self.manager, self.own, 'manager', self.sector))
+        self.assertEqual(stored_counts(), actual_counts())
+        ((pk, deadline),), options = apply_async.call_args
+        self.assertEqual((pk, parse_datetime(deadline), options), (task.id, task.deadline,
+                                                                    {'eta': missed_at(task.deadline)}))
+
+    def test_invalid_deadline(self):
+        response = self.post([self.own.id], deadline=timezone.now())
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+
+class TaskExportTest(TestCase):
+    """Exports stream under both WSGI and ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.employee = CustomUser.objects.create(username='employee')
+        Task.objects.bulk_create(
+            Task(problem=f'p{i}', deadline=timezone.now() + timedelta(days=3), boss=cls.director,
+                 boss_status='director', employee=cls.employee)
+            for i in range(3)
+        )
+
+    def test_wsgi(self):
+        client = APIClient()
+        client.force_authenticate(self.director)
+        response = client.get(reverse('tasks_export'))
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+    async def test_asgi(self):
+        token = set_role_claims(AccessToken.for_user(self.director), self.director)
+        response = await AsyncClient().get(reverse('tasks_export'), {'type': 'jsonl'},
+                                           headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)['problem'] for line in content.splitlines()], ['p0', 'p1', 'p2'])
+
+
+class TaskReviewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = CustomUser.objects.create(username='boss', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+        deadline = timezone.now() + timedelta(days=3)
+        cls.task = Task.objects.create(problem='p', deadline=deadline, boss=cls.boss, employee=cls.employee)
+        other = Task.objects.create(problem='o', deadline=deadline, boss=cls.boss, employee=cls.boss)
+        cls.other_review = TaskReview.objects.create(task=other, user=cls.boss, content='c')
+
+    def test_reply_is_read_only(self):
+        client = APIClient()
+        client.force_authenticate(self.employee)
+        response = client.post(reverse('reviews_for_task', args=[self.task.id]),
+                               {'content': 'c', 'reply': self.other_review.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(TaskReview.objects.get(pk=response.json()['id']).reply)
+
+
+class MissedSweepTest(TestCase):
+    def setUp(self):
+        break_lock(MISSED_SWEEP_LOCK)
+
+    def test_overlapping_sweep_skips(self):
+        with cache_lock(MISSED_SWEEP_LOCK, 60), mock.patch('task.tasks.sync_deadlines') as sweep:
+            update_task_missed()
+        sweep.assert_not_called()
+
+    def test_keeps_a_lock_taken_after_expiry(self):
+        other = ExitStack()
+
+        def sweep(tasks):
+            # The lock timed out mid-sweep and another worker took it.
+            break_lock(MISSED_SWEEP_LOCK)
+            self.assertTrue(other.enter_context(cache_lock(MISSED_SWEEP_LOCK, 60)))
+            return 0
+
+        with other, mock.patch('task.tasks.sync_deadlines', sweep):
+            update_task_missed()
+            with cache_lock(MISSED_SWEEP_LOCK, 60) as acquired:
+                self.assertFalse(acquired)
+
+    def test_releases_its_lock(self):
+        update_task_missed()
+        with cache_lock(MISSED_SWEEP_LOCK, 60) as acquired:
+            self.assertTrue(acquired)
+
+    def test_redis_lock(self):
+        redis_client = mock.Mock()
+        lock = redis_client.lock.return_value
+        lock.acquire.return_value = True
+        # The release script found another worker's token.
+        lock.release.side_effect = LockNotOwnedError
+        with mock.patch('task.locks.client', return_value=redis_client), \
+                mock.patch('task.tasks.sync_deadlines', return_value=0):
+            self.assertEqual(update_task_missed(), 0)
+        redis_client.lock.assert_called_once_with(MISSED_SWEEP_LOCK, timeout=MISSED_SWEEP_LOCK_TIMEOUT,
+                                                  blocking=False)
+        lock.release.assert_called_once_with()
+        redis_client.delete.assert_not_called()
+
+    def test_redis_client(self):
+        caches = {'default': {'BACKEND': REDIS_CACHE, 'LOCATION': 'redis://a:6379/1,redis://b:6379/1'}}
+        with override_settings(CACHES=caches), mock.patch('task.locks._client', None), \
+                mock.patch('redis.Redis.from_url') as from_url:
+            self.assertIs(locks.client(), from_url.return_value)
+        from_url.assert_called_once_with('redis://a:6379/1')
+
+
+class ReportJobTest(TestCase):
+    """Report jobs run on commit from pending to done (or failed) and only directors see them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.director = CustomUser.objects.create(username='director', status='director')
+        cls.manager = CustomUser.objects.create(username='manager', status='manager', sector=cls.sector)
+        cls.employee = CustomUser.objects.create(username='employee', sector=cls.sector)
+        deadline = timezone.now() + timedelta(days=3)
+        for status in ('doing', 'finished'):
+            Task.objects.create(problem='p', deadline=deadline, status=status, boss=cls.manager,
+                                employee=cls.employee)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def request(self, kind, file_format):
+        today = timezone.localdate().isoformat()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('reports'), {'kind': kind, 'start_date': today, 'end_date': today,
+                                                         'file_format': file_format})
+
+    def content(self, job_id):
+        job = ReportJob.objects.get(pk=job_id)
+        with job.file.open('rb') as f:
+            return gzip.decompress(f.read()).decode()
+
+    def test_sector_jsonl(self):
+        response = self.request('sector', 'jsonl')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')
+        data = self.client.get(reverse('report', args=[response.json()['id']])).json()
+        self.assertEqual((data['status'], data['progress']), ('done', 100))
+        self.assertTrue(data['download'])
+        rows = [json.loads(line) for line in self.content(data['id']).splitlines()]
+        self.assertEqual([(row['name'], row['total'], row['doing'], row['finished']) for row in rows],
+                         [('A', 2, 1, 1)])
+
+    def test_employee_csv(self):
+        job_id = self.request('employee', 'csv').json()['id']
+        header, row = self.content(job_id).splitlines()
+        self.assertEqual(header.split(',')[:3], ['group_id', 'name', 'total'])
+        self.assertEqual(row.split(',')[:3], [str(self.employee.id), 'employee', '2'])
+
+    def test_same_parameters_share_a_job(self):
+        job_id = self.request('sector', 'csv').json()['id']
+        response = self.request('sector', 'csv')
+        self.assertEqual((response.status_code, response.json()['id']), (200, job_id))
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_failed(self):
+        job = ReportJob.objects.create(kind='sector', start_date=timezone.localdate(),
+                                       end_date=timezone.localdate(), key='k', requested_by=self.director)
+        with mock.patch('task.tasks.generate', side_effect=OSError('disk full')), self.assertRaises(OSError):
+            generate_report(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'disk full'))
+        self.assertIsNotNone(job.finished)
+        # A failed job is not reused.
+        self.assertEqual(self.request('sector', 'csv').status_code, 201)
+
+    def test_permissions(self):
+        job_id = self.request('sector', 'csv').json()['id']
+        for user in (self.manager, self.employee):
+            client = APIClient()
+            client.force_authenticate(user)
+            self.assertEqual(client.get(reverse('report', args=[job_id])).status_code, 403)
+            self.assertEqual(client.post(reverse('reports'), {}).status_code, 403)
+        self.assertEqual(APIClient().get(reverse('report', args=[job_id])).status_code, 401)
+
+
+class DeadlineSchedulingTest(TestCase):
+    """Deadline jobs are enqueued on commit and only act on the deadline they were scheduled for."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create(username='manager', status='manager')
+        cls.employee = CustomUser.objects.create(username='employee')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def task(self, days, status='doing'):
+        return Task.objects.create(problem='p', deadline=timezone.now() + timedelta(days=days), status=status,
+                                   boss=self.manager, employee=self.employee)
+
+    def enqueued(self, action):
+        with mock.patch('task.tasks.apply_deadline.apply_async') as apply_async, \
+                mock.patch('task.tasks.apply_deadline.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(apply_async.called, 'enqueued before the commit')
+            action()
+        jobs = [(pk, parse_datetime(deadline), options['eta']) for ((pk, deadline),), options in
+                apply_async.call_args_list]
+        return jobs, [(pk, parse_datetime(deadline)) for (pk, deadline), _ in delay.call_args_list]
+
+    def test_create(self):
+        deadline = timezone.now() + timedelta(days=3)
+        jobs, now = self.enqueued(lambda: self.client.post(reverse('tasks_create'), {
+            'problem': 'p', 'deadline': deadline.isoformat(), 'employee': self.employee.id}))
+        task = Task.objects.get()
+        self.assertEqual(jobs, [(task.id, deadline, missed_at(deadline))])
+        self.assertEqual(now, [])
+
+    def test_deadline_edit(self):
+        task = self.task(3)
+        deadline = task.deadline + timedelta(days=2)
+        jobs, _ = self.enqueued(lambda: self.client.patch(reverse('task_detail', args=[task.id]),
+                                                          {'deadline': deadline.isoformat()}))
+        self.assertEqual(jobs, [(task.id, deadline, missed_at(deadline))])
+        # Edits that keep the deadline schedule nothing.
+        jobs, _ = self.enqueued(lambda: self.client.patch(reverse('task_detail', args=[task.id]),
+                                                          {'problem': 'changed'}))
+        self.assertEqual(jobs, [])
+
+    def test_missed_task_reopened_right_away(self):
+        task = self.task(-3, status='missed')
+        deadline = timezone.now() + timedelta(days=3)
+        _, now = self.enqueued(lambda: self.client.patch(reverse('task_detail', args=[task.id]),
+                                                         {'deadline': deadline.isoformat()}))
+        self.assertEqual(now, [(task.id, deadline)])
+        apply_deadline(task.id, deadline.isoformat())
+        self.assertEqual(Task.objects.get(pk=task.pk).status, 'doing')
+
+    def test_due_job(self):
+        task = self.task(-1)
+        self.assertEqual(apply_deadline(task.id, task.deadline.isoformat()), 1)
+        self.assertEqual(Task.objects.get(pk=task.pk).status, 'missed')
+
+    def test_stale_job_after_deadline_edit(self):
+        task = self.task(-1)
+        old = task.deadline.isoformat()
+        Task.objects.filter(pk=task.pk).update(deadline=timezone.now() - timedelta(hours=30))
+        self.assertEqual(apply_deadline(task.id, old), 0)
+        self.assertEqual(Task.objects.get(pk=task.pk).status, 'doing')
+
+    def test_stale_job_after_terminal_status(self):
+        for status in ('finished', 'canceled'):
+            task = self.task(-1, status=status)
+            self.assertEqual(apply_deadline(task.id, task.deadline.isoformat()), 0)
+            self.assertEqual(Task.objects.get(pk=task.pk).status, status)
+
+    def test_missed_at_day_boundary(self):
+        local = timezone.get_current_timezone()
+        cases = [
+            (datetime(2026, 3, 10, 23, 59, 59, tzinfo=local), datetime(2026, 3, 11, tzinfo=local)),
+            (datetime(2026, 3, 11, tzinfo=local), datetime(2026, 3, 12, tzinfo=local)),
+            # 01:30 on March 11 in Tashkent, still March 10 in UTC.
+            (datetime(2026, 3, 10, 20, 30, tzinfo=dt_timezone.utc), datetime(2026, 3, 12, tzinfo=local)),
+        ]
+        for deadline, expected in cases:
+            with self.subTest(deadline=deadline):
+                self.assertEqual(missed_at(deadline), expected)
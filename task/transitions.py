@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .events import change, publish
+from .audit import record
+from .models import STORED_STATE_FIELDS, Task
+from .rollup import record_bulk_change
+
+CHUNK_SIZE = 1000
+
+
+def bulk_transition(tasks, status, chunk_size=CHUNK_SIZE, audit=None):
+    """
+    Move every task matched by ``tasks`` to ``status`` with set-based updates.
+
+    Works in primary-key chunks, each one a transaction that locks its rows,
+    re-checks them against ``tasks``, updates them with a single ``UPDATE``
+    keeps the stats rollup in step and publishes the changes (``task.events``).
+    Running it twice is harmless: rows
+    already in ``status`` no longer match. ``audit`` adds the history rows
+    (``task.audit``) and defaults to ``settings.TASK_SWEEP_AUDIT``.
+
+    Returns the primary keys of the tasks changed.
+    """
+    if audit is None:
+        audit = settings.TASK_SWEEP_AUDIT
+    tasks = tasks.exclude(status=status)
+    changed = []
+    last_pk = 0
+    while True:
+        chunk = list(tasks.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return changed
+        last_pk = chunk[-1]
+        with transaction.atomic():
+            states = list(
+                tasks.filter(pk__in=chunk).select_for_update().values('pk', *STORED_STATE_FIELDS)
+            )
+            pks = [state.pop('pk') for state in states]
+            updated = timezone.now()
+            Task.objects.filter(pk__in=pks).update(status=status, updated=updated)
+            record_bulk_change(states, status=status)
+            publish([change(pk, state['boss_id'], state['employee_id'], status, state['status'], updated)
+                     for pk, state in zip(pks, states)])
+            if audit:
+                record(pks, ['status'])
+        changed += pks
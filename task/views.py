@@ -1,45 +1,99 @@
-from django.db.models import Q
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.exceptions import ValidationError
 
+from .cache import cache_stats, users_version
+from . import events, feed
+from .export import EXPORT_CHUNK_SIZE, TASK_COLUMNS, export_kind, export_response, task_rows
+from .conditional import make_etag, not_modified, set_validators
 from .ordering import DateRangeFilter
-from .serializers import TaskSerializer, TaskReviewSerializer
-from .models import Task, TaskReview
+from .pagination import TaskCursorPagination
+from .serializers import TaskSerializer, TaskReviewSerializer, BulkTaskCreateSerializer, BulkTaskIdsSerializer, \
+    ReportJobSerializer
+from .models import ReportJob, Task, TaskReview
+from .reports import report_key
+from .tasks import generate_report
+from .scheduler import schedule_deadline
+from .transitions import bulk_transition
+from .stats import COUNTERS, with_task_stats, adirector_task_stats, asector_task_stats, percentages
+from user.authentication import QueryTokenJWTAuthentication
 from user.models import CustomUser, Sector
 from user.serializers import UserStatSerializer
+from api.views import AsyncAPIView
 from api.permission import IsDirector, IsManager, IsOwnerOfTask, IsDirectorOrManager, IsBossOrWorker, IsOwnerOfReview, \
     IsAdmin
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import generics, permissions, filters
+from rest_framework import filters, generics, permissions, status
 
 
-class ManagerTaskListView(APIView):
+class TaskListMixin:
+    """Filtering and cursor pagination shared by the task list views."""
+    filter_backends = [DjangoFilterBackend, DateRangeFilter]
+    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+    pagination_class = TaskCursorPagination
+
+    def filter_queryset(self, queryset):
+        for backend in list(self.filter_backends):
+            queryset = backend().filter_queryset(self.request, queryset, view=self)
+        return queryset
+
+    def get_queryset(self):
+        return TaskSerializer.setup_eager_loading(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(self.filter_queryset(self.get_queryset()))
+
+    def paginated_response(self, tasks):
+        # Any change to the listed tasks moves the newest ``updated`` or the count; remain_days
+        # moves with the date and the boss names with the users.
+        state = tasks.aggregate(last_modified=Max('updated'), count=Count('id'))
+        etag = make_etag(self.request.user.pk, self.request.get_full_path(), state['last_modified'], state['count'],
+                         timezone.localdate(), users_version())
+        response = not_modified(self.request, etag)
+        if response is not None:
+            return response
+
+        paginator = self.pagination_class()
+        tasks = TaskSerializer.setup_eager_loading(tasks)
+        page = paginator.paginate_queryset(tasks, self.request, view=self)
+        serializer = TaskSerializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        return set_validators(response, etag)
+
+
+class ManagerTaskListView(TaskListMixin, APIView):
     permission_classes = [IsManager]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['employee', 'deadline']
-    filterset_fields = ['employee', 'deadline', 'created_at']
+    filter_backends = TaskListMixin.filter_backends + [filters.SearchFilter]
+    # ``employee`` is a foreign key, so it is searched by name.
+    search_fields = ['employee__username', 'employee__first_name', 'employee__last_name']
 
     def get(self, request):
         tasks = Task.objects.filter(Q(boss=request.user) & Q(is_active=True))
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.filter_queryset(tasks))
 
 
-class TaskListCreateView(generics.ListCreateAPIView):
+class TaskListCreateView(TaskListMixin, generics.ListCreateAPIView):
     permission_classes = [IsDirectorOrManager, ]
     queryset = Task.objects.filter(is_active=True)
     serializer_class = TaskSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(boss=self.request.user)
+        task = serializer.save(boss=self.request.user)
+        schedule_deadline(task)
 
 
-class DirectorTaskListCreateView(generics.ListAPIView):
+class DirectorTaskListCreateView(TaskListMixin, generics.ListAPIView):
     permission_classes = [IsDirector]
-    queryset = Task.objects.filter(is_active=True).exclude(boss__status='manager')
+    queryset = Task.objects.filter(is_active=True, boss_status__in=['director', 'admin'])
     serializer_class = TaskSerializer
 
     def perform_create(self, serializer):
@@ -48,17 +102,42 @@ class DirectorTaskListCreateView(generics.ListAPIView):
 
 class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsOwnerOfTask, IsAdmin]
-    queryset = Task.objects.filter(is_active=True)
+    queryset = TaskSerializer.setup_eager_loading(Task.objects.filter(is_active=True))
     serializer_class = TaskSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        task = self.get_object()
+        etag = make_etag(task.pk, task.updated.isoformat(), task.boss.username, timezone.localdate())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(task)
+        return set_validators(Response(serializer.data), etag)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        deadline = serializer.instance.deadline
+        task = serializer.save()
+        if task.deadline != deadline:
+            schedule_deadline(task)
+
 
 class TaskReviewListView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated, IsBossOrWorker]
-    queryset = TaskReview.objects.all()
+    queryset = TaskReviewSerializer.setup_eager_loading(TaskReview.objects.all())
     serializer_class = TaskReviewSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'id' in self.kwargs:
+            queryset = queryset.filter(task_id=self.kwargs['id'])
+        return queryset
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        if 'id' in self.kwargs:
+            serializer.save(user=self.request.user, task_id=self.kwargs['id'])
+        else:
+            serializer.save(user=self.request.user)
 
 
 class TaskReviewsList(APIView):
@@ -67,8 +146,8 @@ class TaskReviewsList(APIView):
     def get(self, request, id):
         try:
             task = Task.objects.get(id=id)
-            reviews = TaskReview.objects.filter(task=task)
-            serializer = UserStatSerializer(reviews, many=True)
+            reviews = TaskReviewSerializer.setup_eager_loading(TaskReview.objects.filter(task=task))
+            serializer = TaskReviewSerializer(reviews, many=True)
             return Response(serializer.data)
         except:
             raise ValidationError(
@@ -81,92 +160,67 @@ class TaskReviewsList(APIView):
 
 class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsOwnerOfReview]
-    queryset = TaskReview.objects.all()
+    queryset = TaskReviewSerializer.setup_eager_loading(TaskReview.objects.all())
     serializer_class = TaskReviewSerializer
 
 
-class StatView(APIView):
-    def get(self, request):
-        tasks = Task.objects.filter(Q(boss__status='admin') | Q(boss__status='director') & Q(is_active=True))
-        all_task = tasks.count()
-        doing = tasks.filter(status='doing').count()
-        finished = tasks.filter(status='finished').count()
-        canceled = tasks.filter(status='canceled').count()
-        missed = tasks.filter(status='missed').count()
-        changed = tasks.filter(is_changed=True).count()
+class StatView(AsyncAPIView):
+    @cache_stats
+    async def get(self, request):
+        counts = await adirector_task_stats()
         data = {}
-        if all_task != 0:
-            data['doing'] = doing
-            data['finished'] = finished
-            data['canceled'] = canceled
-            data['missed'] = missed
-            data['p_doing'] = doing * 100 / all_task
-            data['p_finished'] = finished * 100 / all_task
-            data['p_canceled'] = canceled * 100 / all_task
-            data['p_missed'] = missed * 100 / all_task
-            data['changed'] = changed * 100 / all_task
+        if counts['total'] != 0:
+            p = percentages(counts)
+            data['doing'] = counts['doing']
+            data['finished'] = counts['finished']
+            data['canceled'] = counts['canceled']
+            data['missed'] = counts['missed']
+            data['p_doing'] = p['p_doing']
+            data['p_finished'] = p['p_finished']
+            data['p_canceled'] = p['p_canceled']
+            data['p_missed'] = p['p_missed']
+            data['changed'] = p['p_changed']
         return Response(data=data)
 
 
-class SectorStatView(APIView):
+class SectorStatView(AsyncAPIView):
 
-    def get(self, request):
-        sectors = Sector.objects.all()
+    @cache_stats
+    async def get(self, request):
+        stats = await asector_task_stats()
         l = []
-        for s in sectors:
+        async for s in Sector.objects.all():
             data = {}
-            tasks = Task.objects.filter((Q(boss__status='admin') | Q(boss__status='director')) & Q(is_active=True) &
-                                        Q(employee__sector=s))
-            all_task = tasks.count()
-            doing = tasks.filter(status='doing').count()
-            finished = tasks.filter(status='finished').count()
-            canceled = tasks.filter(status='canceled').count()
-            missed = tasks.filter(status='missed').count()
-            changed = tasks.filter(is_changed=True).count()
-            if all_task != 0:
+            counts = stats.get(s.id)
+            if counts:
                 data['sector'] = s.name
-                data['doing'] = doing
-                data['finished'] = finished
-                data['canceled'] = canceled
-                data['missed'] = missed
-                data['p_doing'] = doing * 100 / all_task
-                data['p_finished'] = finished * 100 / all_task
-                data['p_canceled'] = canceled * 100 / all_task
-                data['p_missed'] = missed * 100 / all_task
-                data['p_changed'] = changed * 100 / all_task
+                data['doing'] = counts['doing']
+                data['finished'] = counts['finished']
+                data['canceled'] = counts['canceled']
+                data['missed'] = counts['missed']
+                data.update(percentages(counts))
             l.append(data)
         return Response({
             'message': l
         })
 
 
-class EachSectorStatView(APIView):
-    def get(self, request, id=id):
+class EachSectorStatView(AsyncAPIView):
+    async def get(self, request, id=id):
         try:
-            sector = Sector.objects.get(id=id)
-            tasks = Task.objects.filter((Q(boss__status='admin') | Q(boss__status='director')) & Q(is_active=True) &
-                                        Q(employee__sector=sector))
-            all_task = tasks.count()
-            doing = tasks.filter(status='doing').count()
-            finished = tasks.filter(status='finished').count()
-            canceled = tasks.filter(status='canceled').count()
-            missed = tasks.filter(status='missed').count()
-            changed = tasks.filter(is_changed=True).count()
+            sector = await Sector.objects.aget(id=id)
+            counts = (await asector_task_stats([sector.id])).get(sector.id)
             data = {}
-            if all_task != 0:
-                data["all_tasks"] = all_task
-                data["doing"] = doing
-                data["finished"] = finished
-                data["canceled"] = canceled
-                data["missed"] = missed
-                data["changed"] = changed
-                data['p_doing'] = doing * 100 / all_task
-                data['p_finished'] = finished * 100 / all_task
-                data['p_canceled'] = canceled * 100 / all_task
-                data['p_missed'] = missed * 100 / all_task
-                data['p_changed'] = changed * 100 / all_task
+            if counts:
+                data["all_tasks"] = counts['total']
+                data["doing"] = counts['doing']
+                data["finished"] = counts['finished']
+                data["canceled"] = counts['canceled']
+                data["missed"] = counts['missed']
+                data["changed"] = counts['changed']
+                data.update(percentages(counts))
             return Response(data=data)
-        except:
+        except Sector.DoesNotExist:
             raise ValidationError(
                 {
                     'status': False,
@@ -175,55 +229,110 @@ class EachSectorStatView(APIView):
             )
 
 
-class EachSectorEmployeeStatView(APIView):
-    def get(self, request, id):
+class EachSectorEmployeeStatView(AsyncAPIView):
+    async def get(self, request, id):
         try:
-            sector = Sector.objects.get(id=id)
-            employees = CustomUser.objects.filter(Q(sector=sector) & Q(status='employee'))
-            serializer = UserStatSerializer(employees, many=True)
-            return Response(serializer.data)
-        except:
+            sector = await Sector.objects.aget(id=id)
+        except Sector.DoesNotExist:
             raise ValidationError(
                 {
                     'status': False,
                     'message': "Bo'lim mavjud emas !"
                 }
             )
+        employees = with_task_stats(CustomUser.objects.filter(Q(sector=sector) & Q(status='employee')))
+        serializer = UserStatSerializer([employee async for employee in employees], many=True)
+        return Response(serializer.data)
 
 
-class EachSectorTasksView(APIView):
-    filter_backends = [DjangoFilterBackend, DateRangeFilter]
-    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+class EachSectorTasksView(TaskListMixin, APIView):
 
     def get(self, request, id=id):
         try:
             sector = Sector.objects.get(id=id)
-            tasks = Task.objects.filter(Q(is_active=True) & Q(boss__sector=sector))
-            tasks = self.filter_queryset(tasks)
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data)
-        except:
+        except Sector.DoesNotExist:
             raise ValidationError(
                 {
                     'status': False,
                     'message': "Bu bo'lim mavjud emas !"
                 }
             )
+        tasks = Task.objects.filter(Q(is_active=True) & Q(boss__sector=sector))
+        return self.paginated_response(self.filter_queryset(tasks))
 
-    def filter_queryset(self, queryset):
-        for backend in list(self.filter_backends):
-            queryset = backend().filter_queryset(self.request, queryset, view=self)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        return queryset
+
+class TaskExportView(TaskListMixin, APIView):
+    """
+    Stream tasks as CSV or JSON Lines (``?type=csv|jsonl``).
+
+    Takes ``?sector=`` like EachSectorTasksView, ``?employee=`` and the
+    ``date_range`` ordering with ``start_date``/``end_date``.
+    """
+    permission_classes = [IsDirector]
+    filterset_fields = ['employee', 'status']
+
+    def get(self, request):
+        kind = export_kind(request)
+        tasks = Task.objects.filter(is_active=True)
+        sector = request.query_params.get('sector')
+        if sector:
+            tasks = tasks.filter(boss__sector=sector)
+        tasks = self.filter_queryset(tasks).order_by('created_at', 'id')
+        return export_response(request, list(TASK_COLUMNS), task_rows(tasks), kind, 'tasks')
+
+
+class EmployeeStatExportView(APIView):
+    """Stream every employee's task counters as CSV or JSON Lines, optionally for one ``?sector=``."""
+    permission_classes = [IsDirector]
+    columns = ['id', 'username', 'first_name', 'last_name', 'sector', 'total'] + list(COUNTERS)
+
+    def get(self, request):
+        kind = export_kind(request)
+        employees = CustomUser.objects.filter(status='employee')
+        sector = request.query_params.get('sector')
+        if sector:
+            employees = employees.filter(sector=sector)
+        rows = with_task_stats(employees).order_by('id').values_list(
+            'id', 'username', 'first_name', 'last_name', 'sector__name', 'total', *COUNTERS
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return export_response(request, self.columns, rows, kind, 'employee_stats')
+
+
+class ReportJobCreateView(generics.CreateAPIView):
+    """
+    Start a period report; a Celery worker computes it into a file.
+
+    Asking again for the same parameters while the task data is unchanged
+    returns the existing job instead of starting a new one.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsDirector]
+    serializer_class = ReportJobSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        key = report_key(data['kind'], data['start_date'], data['end_date'], data.get('file_format', 'csv'))
+        job = ReportJob.objects.filter(key=key).exclude(status='failed').order_by('-created').first()
+        if job is not None:
+            return Response(self.get_serializer(job).data)
+
+        job = serializer.save(key=key, requested_by=request.user)
+        transaction.on_commit(lambda: generate_report.delay(job.pk))
+        return Response(self.get_serializer(job).data, status=status.HTTP_201_CREATED)
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsDirector]
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
 
 
 class EachTaskReview(APIView):
     def get(self, request, id=id):
         try:
             task = Task.objects.get(id=id)
-            reviews = TaskReview.objects.filter(task=task)
+            reviews = TaskReviewSerializer.setup_eager_loading(TaskReview.objects.filter(task=task))
             serializer = TaskReviewSerializer(reviews, many=True)
             return Response(serializer.data)
         except:
@@ -238,6 +347,7 @@ class EachTaskReview(APIView):
 class FinishTaskView(APIView):
     permission_classes = [IsBossOrWorker]
 
+    @transaction.atomic
     def patch(self, request, id):
         try:
             task = Task.objects.get(id=id)
@@ -285,6 +395,7 @@ class FinishTaskView(APIView):
 class CancelTaskView(APIView):
     permission_classes = [IsBossOrWorker]
 
+    @transaction.atomic
     def patch(self, request, id):
         try:
             task = Task.objects.get(id=id)
@@ -329,96 +440,195 @@ class CancelTaskView(APIView):
             )
 
 
-class UserSectorTasksView(APIView):
-    filter_backends = [DjangoFilterBackend, DateRangeFilter]
-    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+class BulkTaskCreateView(APIView):
+    permission_classes = [IsDirectorOrManager]
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = BulkTaskCreateSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        return Response(
+            {
+                'status': True,
+                'results': results
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
+class BulkStatusView(APIView):
+    """
+    Move a list of tasks from ``doing`` to ``target`` in one transaction.
+
+    Only tasks the user gave or received are touched; every id gets its own
+    result, with the same messages as the single-task views.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    target = None
+    done_message = None
+    messages = {}
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = BulkTaskIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        tasks = Task.objects.filter(Q(pk__in=ids) & Q(is_active=True) &
+                                    (Q(boss=request.user) | Q(employee=request.user)))
+        current = dict(tasks.values_list('pk', 'status'))
+        changed = set(bulk_transition(tasks.filter(status='doing'), self.target, audit=True))
+
+        results = []
+        for pk in ids:
+            if pk in changed:
+                results.append({'id': pk, 'status': True, 'message': self.done_message})
+            elif pk in current:
+                results.append({'id': pk, 'status': False, 'message': self.messages.get(
+                    current[pk], 'Topshiriqni bajarilish muddati tugagan !')})
+            else:
+                results.append({'id': pk, 'status': False, 'message': 'Topshiriq mavjud emas!'})
+        return Response(
+            {
+                'status': True,
+                'results': results
+            }
+        )
+
+
+class BulkFinishTaskView(BulkStatusView):
+    target = 'finished'
+    done_message = 'Topshiriq yakunlandi'
+    messages = {
+        'finished': 'Topshiriq yakunlangan !',
+        'canceled': 'Topshiriq bekor qilingan, yakunlay olmaysiz !',
+    }
+
+
+class BulkCancelTaskView(BulkStatusView):
+    target = 'canceled'
+    done_message = 'Topshiriq bekor qilindi'
+    messages = {
+        'canceled': 'Topshiriq bekor qilingan !',
+        'finished': 'Topshiriq yakunlangan !',
+    }
+
+
+class TaskChangesView(APIView):
+    """
+    Tasks the user sees that changed after ``?since=``, plus tombstones of deactivated or deleted ones.
+
+    Poll with the ``since`` of the previous response; without it the feed starts
+    from the beginning. ``has_more`` asks for the next page right away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        try:
+            cursor = feed.decode_cursor(since) if since else None
+        except feed.InvalidCursor:
+            raise ValidationError(
+                {
+                    'status': False,
+                    'message': "Noto'g'ri kursor !"
+                }
+            )
+        if cursor and feed.expired(cursor):
+            return Response(
+                {
+                    'status': False,
+                    'reset': True,
+                    'message': "Kursor eskirgan, topshiriqlarni qaytadan yuklang !"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('page_size', settings.TASK_PAGE_SIZE)),
+                        settings.TASK_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = settings.TASK_PAGE_SIZE
+        tasks, tombstones, cursor, has_more = feed.changes(request.user, cursor, max(limit, 1))
+        return Response(
+            {
+                'status': True,
+                'results': TaskSerializer(tasks, many=True).data,
+                'tombstones': tombstones,
+                'since': feed.encode_cursor(*cursor),
+                'has_more': has_more,
+            }
+        )
+
+
+class TaskEventsView(AsyncAPIView):
+    """
+    Server-sent events of the task changes the user sees, see ``task.events``.
+
+    Needs ASGI: under WSGI a stream would hold a worker for its whole life.
+    ``EventSource`` passes the access token as ``?token=``.
+    """
+    authentication_classes = [QueryTokenJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            raise ValidationError(
+                {
+                    'status': False,
+                    'message': "Bu manzil faqat ASGI serverida ishlaydi !"
+                }
+            )
+        response = StreamingHttpResponse(
+            events.stream(request.user, request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Tells nginx not to buffer the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class UserSectorTasksView(TaskListMixin, APIView):
 
     def get(self, request, id):
         try:
             user = CustomUser.objects.get(id=id)
-            tasks = Task.objects.filter(Q(employee=user) & Q(boss__status='manager'))
-            tasks = self.filter_queryset(tasks)
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data)
-        except:
+        except CustomUser.DoesNotExist:
             raise ValidationError(
                 {
                     'status': False,
                     'message': "Bu foydalanuvchi mavjud emas !"
                 }
             )
+        tasks = Task.objects.filter(Q(employee=user) & Q(boss_status='manager'))
+        return self.paginated_response(self.filter_queryset(tasks))
 
-    def filter_queryset(self, queryset):
-        for backend in list(self.filter_backends):
-            queryset = backend().filter_queryset(self.request, queryset, view=self)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        return queryset
 
-
-class UserDirectorTasksView(APIView):
-    filter_backends = [DjangoFilterBackend, DateRangeFilter]
-    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+class UserDirectorTasksView(TaskListMixin, APIView):
 
     def get(self, request, id):
         try:
             user = CustomUser.objects.get(id=id)
-            tasks = Task.objects.filter(Q(employee=user) & (Q(boss__status='director') | Q(boss__status='admin')))
-            tasks = self.filter_queryset(tasks)
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data)
-        except:
+        except CustomUser.DoesNotExist:
             raise ValidationError(
                 {
                     'status': False,
                     'message': "Bu foydalanuvchi mavjud emas !"
                 }
             )
-
-    def filter_queryset(self, queryset):
-        for backend in list(self.filter_backends):
-            queryset = backend().filter_queryset(self.request, queryset, view=self)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        return queryset
+        tasks = Task.objects.filter(Q(employee=user) & Q(boss_status__in=['director', 'admin']))
+        return self.paginated_response(self.filter_queryset(tasks))
 
 
-class RequestUserSectorTasksView(APIView):
-    filter_backends = [DjangoFilterBackend, DateRangeFilter]
-    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+class RequestUserSectorTasksView(TaskListMixin, APIView):
 
     def get(self, request):
-        tasks = Task.objects.filter(Q(employee=request.user) & Q(boss__status='manager'))
-        tasks = self.filter_queryset(tasks)
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        tasks = Task.objects.filter(Q(employee=request.user) & Q(boss_status='manager'))
+        return self.paginated_response(self.filter_queryset(tasks))
 
-    def filter_queryset(self, queryset):
-        for backend in list(self.filter_backends):
-            queryset = backend().filter_queryset(self.request, queryset, view=self)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        return queryset
 
-
-class RequestUserDirectorTasksView(APIView):
-    filter_backends = [DjangoFilterBackend, DateRangeFilter]
-    ordering_fields = ['employee__first_name', 'deadline', 'created_at', 'boss', 'status', 'date_range']
+class RequestUserDirectorTasksView(TaskListMixin, APIView):
 
     def get(self, request):
-        user = CustomUser.objects.get(id=id)
-        tasks = Task.objects.filter(Q(employee=user) & (Q(boss__status='director') | Q(boss__status='admin')))
-        tasks = self.filter_queryset(tasks)
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
-
-    def filter_queryset(self, queryset):
-        for backend in list(self.filter_backends):
-            queryset = backend().filter_queryset(self.request, queryset, view=self)
-        ordering = self.request.query_params.get("ordering", None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        return queryset
+        tasks = Task.objects.filter(Q(employee=request.user) & Q(boss_status__in=['director', 'admin']))
+        return self.paginated_response(self.filter_queryset(tasks))
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomUser
+
+# Claims added to every token by the login and refresh serializers.
+ROLE_CLAIMS = ('status', 'sector_id')
+
+USER_CACHE_KEY = 'user:row:{}'
+
+
+def set_role_claims(token, user):
+    for claim in ROLE_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def active_user(user_id):
+    """The user a token is refreshed for; the role claims are re-read from it."""
+    try:
+        user = CustomUser.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    except CustomUser.DoesNotExist:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    return user
+
+
+def user_fields(pk):
+    """
+    Every field of a user, kept for ``JWT_USER_CACHE_TIMEOUT`` seconds in this process.
+
+    Changes made elsewhere show up once the entry expires, so keep it short.
+    """
+    cache = caches['local']
+    key = USER_CACHE_KEY.format(pk)
+    fields = cache.get(key)
+    if fields is None:
+        try:
+            user = CustomUser._base_manager.get(pk=pk)
+        except CustomUser.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        fields = {field.attname: getattr(user, field.attname) for field in CustomUser._meta.concrete_fields}
+        cache.set(key, fields, settings.JWT_USER_CACHE_TIMEOUT)
+    return fields
+
+
+def forget_user_fields(pk):
+    caches['local'].delete(USER_CACHE_KEY.format(pk))
+
+
+def token_user(user_id, claims):
+    """
+    A ``CustomUser`` holding only what the token says, without a query.
+
+    Every other field is deferred; reading one loads the full row through
+    ``user_fields`` (see ``CustomUser.refresh_from_db``).
+    """
+    values = {'id': user_id, **claims}
+    field_names = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in values]
+    user = CustomUser.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+    user.from_token = True
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that takes the user's role and sector from the token.
+
+    Permissions and role-scoped queries only need ``id``, ``status`` and
+    ``sector_id``, so requests are authenticated without reading the user
+    row each time: like ``JWTAuthentication``, deleted and inactive users are
+    refused, but by the copy ``user_fields`` keeps. Tokens issued before the
+    claims existed fall back to the lookup.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if any(claim not in validated_token for claim in ROLE_CLAIMS):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if not user_fields(user_id)['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return token_user(user_id, {claim: validated_token[claim] for claim in ROLE_CLAIMS})
+
+
+class QueryTokenJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    ``ClaimsJWTAuthentication`` that also takes the access token from ``?token=``.
+
+    For ``EventSource``, which cannot send an ``Authorization`` header; only
+    use it on views that need it, as query strings end up in access logs.
+    """
+
+    def authenticate(self, request):
+        if self.get_header(request) is not None:
+            return super().authenticate(request)
+        raw_token = request.query_params.get('token')
+        if not raw_token:
+            return None
+        validated_token = self.get_validated_token(raw_token.encode())
+        return self.get_user(validated_token), validated_token
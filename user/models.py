@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 class Sector(models.Model):
@@ -25,3 +27,47 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_role()
+        return instance
+
+    def remember_role(self):
+        # Compared on save to propagate role or sector changes to the task snapshots.
+        if 'status' in self.__dict__ and 'sector_id' in self.__dict__:
+            self._stored_role = (self.status, self.sector_id)
+        else:
+            self._stored_role = None
+
+    def refresh_from_db(self, using=None, fields=None):
+        if fields is not None and getattr(self, 'from_token', False):
+            # Built from JWT claims (user.authentication.token_user): fill in every
+            # deferred field at once from the short-lived local copy of the row.
+            from .authentication import user_fields
+
+            deferred = self.get_deferred_fields()
+            self.__dict__.update({name: value for name, value in user_fields(self.pk).items() if name in deferred})
+            return
+        super().refresh_from_db(using, fields)
+
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=Sector)
+def invalidate_org_structure(sender, **kwargs):
+    from task.cache import bump_stats_version, bump_users_version
+    from .org import forget_org_structure
+
+    forget_org_structure()
+    # Stats responses carry names and sectors too, task lists the boss names.
+    bump_stats_version()
+    bump_users_version()
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def forget_cached_user(sender, instance, **kwargs):
+    from .authentication import forget_user_fields
+
+    forget_user_fields(instance.pk)
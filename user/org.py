@@ -0,0 +1,59 @@
+import string
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import CustomUser
+
+ORG_CACHE_KEY = 'user:org-structure'
+
+
+class OrgStructure:
+    """
+    Who leads what and how many people work where.
+
+    Built with two queries, kept in the cache until a user or sector changes
+    and read once per request by ``UserProfileSerializer``.
+    """
+
+    def __init__(self, director, managers, headcount, staff):
+        self.director = director
+        self.managers = managers
+        self.headcount = headcount
+        self.staff = staff
+
+    @classmethod
+    def load(cls):
+        org = cache.get(ORG_CACHE_KEY)
+        if org is None:
+            org = cls.build()
+            cache.set(ORG_CACHE_KEY, org, None)
+        return org
+
+    @classmethod
+    def build(cls):
+        director = ''
+        managers = {}
+        leaders = CustomUser.objects.filter(status__in=['director', 'manager']).order_by('pk').values_list(
+            'status', 'sector_id', 'first_name', 'last_name'
+        )
+        for status, sector_id, first_name, last_name in leaders:
+            name = string.capwords(f'{first_name} {last_name}')
+            if status == 'director':
+                director = director or name
+            else:
+                managers.setdefault(sector_id, name)
+
+        headcount = {}
+        staff = 0
+        groups = CustomUser.objects.values_list('status', 'sector_id').annotate(count=Count('id')).order_by()
+        for status, sector_id, count in groups:
+            if status == 'employee':
+                headcount[sector_id] = count
+            if status not in ('director', 'admin'):
+                staff += count
+        return cls(director, managers, headcount, staff)
+
+
+def forget_org_structure():
+    cache.delete(ORG_CACHE_KEY)
@@ -1,12 +1,16 @@
 import re
-import string
-from django.db.models import Q
 from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt import serializers as jwt_serializers
 from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 from django.utils.text import gettext_lazy as _
 
+from .authentication import active_user, set_role_claims
 from .models import CustomUser, Sector
+from .tokens import RefreshToken
+from .org import OrgStructure
+from task.stats import percent, user_task_stats
 from rest_framework import serializers
 
 
@@ -46,6 +50,33 @@ class RefreshTokenSerializer(serializers.Serializer):
             self.fail('bad_token')
 
 
+class RoleTokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """Login tokens carrying the user's role claims, see ``user.authentication``."""
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        return set_role_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refreshed tokens get the user's current role claims, not the ones of the old token."""
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'], verify=False)
+        user = active_user(access[api_settings.USER_ID_CLAIM])
+        data['access'] = str(set_role_claims(access, user))
+        if 'refresh' in data:
+            data['refresh'] = str(set_role_claims(RefreshToken(data['refresh'], verify=False), user))
+        return data
+
+
+class RedisTokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    token_class = RefreshToken
+
+
 class UserSignUpSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -147,24 +178,27 @@ class UserProfileSerializer(serializers.ModelSerializer):
                 }
             )
 
+    @property
+    def org(self):
+        # Shared by every row of a list response, so it is loaded once per request.
+        root = self.root
+        if not hasattr(root, '_org'):
+            root._org = OrgStructure.load()
+        return root._org
+
     def get_boss(self, obj):
-        boss = CustomUser.objects.filter(status='director').first()
-        return string.capwords(f'{boss.first_name} {boss.last_name}')
+        return self.org.director
 
     def get_sector_boss(self, obj):
         if obj.status == 'employee':
-            boss = CustomUser.objects.filter(Q(status='manager') & Q(sector=obj.sector)).first()
-            return string.capwords(f'{boss.first_name} {boss.last_name}')
+            return self.org.managers.get(obj.sector_id, '')
         return ''
 
     def get_total_workers(self, obj):
         if obj.status == "manager":
-            workers = CustomUser.objects.filter(Q(status='employee') & Q(sector=obj.sector))
-            return workers.count()
+            return self.org.headcount.get(obj.sector_id, 0)
         elif obj.status == "director":
-            workers = CustomUser.objects.all().exclude(status='director')
-            workers = workers.exclude(status='admin')
-            return workers.count()
+            return self.org.staff
         else:
             return 0
 
@@ -190,113 +224,44 @@ class UserStatSerializer(serializers.ModelSerializer):
                   'doing_percent', 'missed_percent', 'finished_percent', 'canceled_percent', 'changed_percent']
         extra_kwargs = {'status': {'read_only': True}}
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['total'] = self.get_total(instance)
-        data['doing'] = self.get_doing(instance)
-        data['finished'] = self.get_finished(instance)
-        data['canceled'] = self.get_canceled(instance)
-        data['changed'] = self.get_changed(instance)
-        data['missed'] = self.get_missed(instance)
-        data['doing_percent'] = self.get_doing_percent(instance)
-        data['missed_percent'] = self.get_missed_percent(instance)
-        data['canceled_percent'] = self.get_canceled_percent(instance)
-        data['finished_percent'] = self.get_finished_percent(instance)
-        data['changed_percent'] = self.get_finished_percent(instance)
-        return data
+    def get_counter(self, obj, key):
+        if obj.status == "director":
+            return None
+        if not hasattr(obj, 'total'):
+            # Not coming from a ``with_task_stats`` queryset, e.g. a single profile.
+            for name, value in user_task_stats(obj).items():
+                setattr(obj, name, value)
+        return getattr(obj, key)
 
     def get_total(self, obj):
-        if obj.status != "director":
-            total = obj.accepted_tasks.all().count()
-            return total
-        return 0
+        return self.get_counter(obj, 'total') or 0
 
     def get_doing(self, obj):
-        if obj.status != "director":
-            done_tasks = obj.accepted_tasks.all()
-            x = 0
-            for i in done_tasks:
-                if i.status == 'doing':
-                    x += 1
-            return x
+        return self.get_counter(obj, 'doing')
 
     def get_finished(self, obj):
-        if obj.status != "director":
-            done_tasks = obj.accepted_tasks.all()
-            x = 0
-            for i in done_tasks:
-                if i.status == 'finished':
-                    x += 1
-            return x
+        return self.get_counter(obj, 'finished')
 
     def get_canceled(self, obj):
-        if obj.status != "director":
-            done_tasks = obj.accepted_tasks.all()
-            x = 0
-            for i in done_tasks:
-                if i.status == 'canceled':
-                    x += 1
-            return x
+        return self.get_counter(obj, 'canceled')
 
     def get_changed(self, obj):
-        if obj.status != "director":
-            done_tasks = obj.accepted_tasks.all()
-            x = 0
-            for i in done_tasks:
-                if i.is_changed:
-                    x += 1
-            return x
+        return self.get_counter(obj, 'changed')
 
     def get_missed(self, obj):
-        if obj.status != "director":
-            done_tasks = obj.accepted_tasks.all()
-            x = 0
-            for i in done_tasks:
-                if i.status == 'missed':
-                    x += 1
-            return x
+        return self.get_counter(obj, 'missed')
 
     def get_doing_percent(self, obj):
-        total = self.get_total(obj)
-        doing = self.get_doing(obj)
-        if total != 0 and doing is not None:
-            perc = (doing * 100.0) / total
-            return perc
-        else:
-            return 0
+        return percent(self.get_doing(obj), self.get_total(obj))
 
     def get_missed_percent(self, obj):
-        total = self.get_total(obj)
-        doing = self.get_missed(obj)
-        if total != 0 and doing is not None:
-            perc = (doing * 100.0) / total
-            return perc
-        else:
-            return 0
+        return percent(self.get_missed(obj), self.get_total(obj))
 
     def get_finished_percent(self, obj):
-        total = self.get_total(obj)
-        doing = self.get_finished(obj)
-        if total != 0 and doing is not None:
-            perc = (doing * 100.0) / total
-            return perc
-        else:
-            return 0
+        return percent(self.get_finished(obj), self.get_total(obj))
 
     def get_canceled_percent(self, obj):
-        total = self.get_total(obj)
-        doing = self.get_canceled(obj)
-        if total != 0 and doing is not None:
-            perc = (doing * 100.0) / total
-            return perc
-        else:
-            return 0
+        return percent(self.get_canceled(obj), self.get_total(obj))
 
     def get_changed_percent(self, obj):
-        total = self.get_total(obj)
-        doing = self.get_changed(obj)
-        if total != 0 and doing is not None:
-            perc = (doing * 100.0) / total
-            return perc
-        else:
-            return 0
+        return percent(self.get_changed(obj), self.get_total(obj))
@@ -0,0 +1,8 @@
+from config.celery import app
+from user import tokens
+
+
+@app.task()
+def flush_expired_tokens():
+    # The token_blacklist tables only grow otherwise; Redis entries expire by themselves.
+    return tokens.flush_expired_tokens()
@@ -1,3 +1,166 @@
+from datetime import timedelta
+
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from task.models import Task
+from .models import CustomUser, Sector
+from .org import ORG_CACHE_KEY, OrgStructure
+from .tokens import RefreshToken, flush_expired_tokens
+
+
+class ClaimsAuthenticationTest(TestCase):
+    """Tokens carry the role claims, so authenticating a request reads no user row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.manager = CustomUser.objects.create(username='manager', status='manager', sector=cls.sector)
+        cls.manager.set_password('secret')
+        cls.manager.save()
+
+    def setUp(self):
+        # Ids come back after a rollback; rows kept by user_fields must not.
+        self.addCleanup(caches['local'].clear)
+        self.client = APIClient()
+        response = self.client.post(reverse('login'), {'username': 'manager', 'password': 'secret'})
+        self.tokens = response.data
+
+    def test_login_claims(self):
+        access = AccessToken(self.tokens['access'])
+        self.assertEqual(access['status'], 'manager')
+        self.assertEqual(access['sector_id'], self.sector.id)
+
+    def test_refresh_reads_current_role(self):
+        CustomUser.objects.filter(pk=self.manager.pk).update(status='director', sector=None)
+        response = self.client.post(reverse('refresh'), {'refresh': self.tokens['refresh']})
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['status'], 'director')
+        self.assertIsNone(access['sector_id'])
+
+    def test_no_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        # The active check reads the row once per JWT_USER_CACHE_TIMEOUT, not per request.
+        self.client.get(reverse('manager_tasks'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('manager_tasks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'FROM "user_customuser"' in query['sql']])
+
+    def test_inactive_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.manager.is_active = False
+        self.manager.save()
+        response = self.client.get(reverse('manager_tasks'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'user_inactive')
+
+    def test_deleted_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.manager.delete()
+        response = self.client.get(reverse('manager_tasks'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'user_not_found')
+
+    def test_old_token_after_role_change(self):
+        employee = CustomUser.objects.create(username='employee', sector=self.sector)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.manager.status = 'director'
+        self.manager.save()
+        deadline = (timezone.now() + timedelta(days=3)).isoformat()
+        self.client.post(reverse('tasks_create'), {'problem': 'p', 'deadline': deadline, 'employee': employee.id})
+        self.client.post(reverse('tasks_bulk_create'),
+                         {'problem': 'p', 'deadline': deadline, 'employees': [employee.id]}, format='json')
+        self.assertEqual(list(Task.objects.values_list('boss_status', flat=True)), ['director', 'director'])
+
+    def test_full_user_on_demand(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        response = self.client.get(reverse('request_user_stat'))
+        self.assertEqual(response.data['id'], self.manager.id)
+        self.assertEqual(response.data['status'], 'manager')
+
+
+class RedisBlacklistTest(TestCase):
+    """Revoked refresh tokens are rejected from the cache; the tables are only an audit log."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='user')
+        cls.user.set_password('secret')
+        cls.user.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.refresh = self.client.post(reverse('login'), {'username': 'user', 'password': 'secret'}).data['refresh']
+
+    def test_rotated_token_rejected_without_queries(self):
+        self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=RefreshToken(self.refresh, verify=False)['jti']).exists())
+
+    def test_blacklist_survives_cache_loss(self):
+        self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        cache.clear()
+        response = self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_flush_expired_tokens(self):
+        self.client.post(reverse('refresh'), {'refresh': self.refresh})
+        OutstandingToken.objects.update(expires_at=aware_utcnow() - timedelta(seconds=1))
+        self.assertEqual(flush_expired_tokens(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class OrgStructureCacheTest(TestCase):
+    """The cached org structure is rebuilt after any user or sector change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name='A')
+        cls.manager = CustomUser.objects.create(username='manager', status='manager', sector=cls.sector,
+                                                first_name='ali', last_name='valiyev')
+        cls.employee = CustomUser.objects.create(username='employee', sector=cls.sector)
+
+    def setUp(self):
+        cache.clear()
+        OrgStructure.load()
+        self.assertEqual(cache.get(ORG_CACHE_KEY).headcount, {self.sector.id: 1})
+
+    def test_user_save(self):
+        self.manager.first_name = 'vali'
+        self.manager.save()
+        self.assertIsNone(cache.get(ORG_CACHE_KEY))
+        self.assertEqual(OrgStructure.load().managers, {self.sector.id: 'Vali Valiyev'})
+
+    def test_user_create(self):
+        CustomUser.objects.create(username='other', sector=self.sector)
+        self.assertEqual(OrgStructure.load().headcount, {self.sector.id: 2})
+
+    def test_user_delete(self):
+        self.employee.delete()
+        self.assertEqual(OrgStructure.load().headcount, {})
+        self.assertEqual(OrgStructure.load().staff, 1)
+
+    def test_sector_save(self):
+        self.sector.name = 'B'
+        self.sector.save()
+        self.assertIsNone(cache.get(ORG_CACHE_KEY))
 
-# Create your tests here.
+    def test_sector_delete(self):
+        # Members are moved out with an UPDATE, which sends no user signals.
+        self.sector.delete()
+        org = OrgStructure.load()
+        self.assertEqual(org.managers, {None: 'Ali Valiyev'})
+        self.assertEqual(org.headcount, {None: 1})
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+BLACKLIST_KEY = 'user:jwt-blacklist:{}'
+# Present while Redis holds the whole blacklist; gone after a restart or a flush.
+BLACKLIST_READY_KEY = 'user:jwt-blacklist:ready'
+BLACKLIST_LOAD_LOCK = 'user:jwt-blacklist:load-lock'
+BLACKLIST_LOAD_CHUNK = 1000
+FLUSH_CHUNK_SIZE = 5000
+
+
+def blacklist_jti(jti, exp):
+    """Revoke ``jti`` in Redis until the token would have expired anyway."""
+    remaining = int(exp - aware_utcnow().timestamp())
+    if remaining > 0:
+        cache.set(BLACKLIST_KEY.format(jti), True, remaining)
+
+
+def is_blacklisted(jti):
+    key = BLACKLIST_KEY.format(jti)
+    found = cache.get_many([key, BLACKLIST_READY_KEY])
+    if key in found:
+        return True
+    if BLACKLIST_READY_KEY in found:
+        return False
+    # Redis lost the blacklist: answer from the audit table until it is loaded again.
+    if cache.add(BLACKLIST_LOAD_LOCK, True, 60):
+        load_blacklist()
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def load_blacklist():
+    """Copy the still-valid revoked JTIs from the audit table into Redis."""
+    revoked = BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow()).values_list(
+        'token__jti', flat=True
+    )
+    # Keys may outlive their token a little; a refresh token lives at most this long.
+    timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    chunk = []
+    # In a transaction, so the server-side cursor also works through DB_POOLED.
+    with transaction.atomic():
+        for jti in revoked.iterator(chunk_size=BLACKLIST_LOAD_CHUNK):
+            chunk.append(jti)
+            if len(chunk) == BLACKLIST_LOAD_CHUNK:
+                cache.set_many({BLACKLIST_KEY.format(jti): True for jti in chunk}, timeout)
+                chunk = []
+    cache.set_many({BLACKLIST_KEY.format(jti): True for jti in chunk}, timeout)
+    cache.set(BLACKLIST_READY_KEY, True, None)
+
+
+def flush_expired_tokens(chunk_size=FLUSH_CHUNK_SIZE):
+    """
+    Delete expired outstanding tokens and their blacklist rows, ``chunk_size`` at a time.
+
+    Expired tokens fail verification on their own, so neither table needs them.
+    """
+    expired = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow())
+    deleted = 0
+    while True:
+        pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            # Only the ids are needed to cascade to BlacklistedToken, not the token text.
+            OutstandingToken.objects.filter(pk__in=pks).only('pk').delete()
+        deleted += len(pks)
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    ``RefreshToken`` checked against the blacklist in Redis.
+
+    Revoking writes the JTI to Redis, with a TTL equal to the token's remaining
+    lifetime, and still records it in the ``token_blacklist`` tables for audit.
+    Verifying a token doesn't touch the database while Redis holds the blacklist.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklist_jti(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return super().blacklist()
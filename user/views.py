@@ -5,7 +5,10 @@ from rest_framework.response import Response
 
 from .serializers import UserSignUpSerializer, SectorSerializer, RefreshTokenSerializer, UserProfileSerializer, UserStatSerializer
 from .models import CustomUser, Sector
+from task.cache import cache_stats
+from task.stats import with_task_stats
 from api import permission
+from api.views import AsyncAPIView
 
 from rest_framework.views import APIView
 from rest_framework import generics, permissions, filters
@@ -62,22 +65,26 @@ class UserProfileListView(generics.ListAPIView):
     serializer_class = UserProfileSerializer
 
 
-class UserStatListView(generics.ListAPIView):
-    queryset = CustomUser.objects.all().exclude(status='director').exclude(status='admin')
-    serializer_class = UserStatSerializer
+class UserStatListView(AsyncAPIView):
+    queryset = with_task_stats(CustomUser.objects.all().exclude(status='director').exclude(status='admin'))
 
+    @cache_stats
+    async def get(self, request):
+        users = self.filter_queryset(self.queryset.all())
+        return Response(UserStatSerializer([user async for user in users], many=True).data)
 
-class ManagerStatListView(generics.ListAPIView):
-    queryset = CustomUser.objects.filter(status='manager')
-    serializer_class = UserStatSerializer
+
+class ManagerStatListView(UserStatListView):
+    queryset = with_task_stats(CustomUser.objects.filter(status='manager'))
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     filterset_fields = ['first_name', 'last_name']
     search_fields = ['first_name', 'last_name']
 
 
 class EmployeeStatListView(generics.RetrieveAPIView):
-    queryset = CustomUser.objects.filter(status='employee')
+    queryset = with_task_stats(CustomUser.objects.filter(status='employee'))
     serializer_class = UserStatSerializer
+    lookup_url_kwarg = 'id'
 
 
 class SectorCreateListView(generics.ListCreateAPIView):